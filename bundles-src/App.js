@@ -13,6 +13,8 @@ import NoResults from "./components/NoResults";
 
 import './css/App.css';
 
+const CATALOGUE_STORAGE_KEY = 'catalogue';
+
 class App extends Component {
 
   constructor(props){
@@ -101,21 +103,54 @@ class App extends Component {
   }
 
 
+  loadCachedCatalogue(){
+    try {
+      return JSON.parse(localStorage.getItem(CATALOGUE_STORAGE_KEY));
+    } catch (error) {
+      return null;
+    }
+  }
+
   async getProducts(){
-    let response = await fetch('/api/products/', {
+    let catalogue = this.loadCachedCatalogue() || {version: 0, products: []};
+    if (catalogue.version){
+      this.setState({
+        products : catalogue.products
+      });
+    }
+
+    let response = await fetch(`/api/products/changes/?since=${catalogue.version}`, {
       headers: {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
       }
     });
 
+    if (response.status === 410){
+      // history is too old, download whole catalogue again
+      localStorage.removeItem(CATALOGUE_STORAGE_KEY);
+      return this.getProducts();
+    }
     if (!response.ok){
       return;
     }
 
     let data = await response.json();
+    let updatedIds = new Set([
+      ...data.removed,
+      ...data.changed.map(product => product.id),
+    ]);
+    let products = _.sortBy([
+      ...catalogue.products.filter(product => !updatedIds.has(product.id)),
+      ...data.changed,
+    ], 'id');
+
+    localStorage.setItem(CATALOGUE_STORAGE_KEY, JSON.stringify({
+      version: data.version,
+      products: products,
+    }));
     this.setState({
-      products : data
+      products : products
     });
   }
 
@@ -1,5 +1,6 @@
 import React, {Component} from 'react';
 import Counter from './Counter';
+import ProductImage from './ProductImage';
 
 class Product extends Component{
   state = {
@@ -38,14 +39,13 @@ class Product extends Component{
   }
 
   render(){
-    let image = this.props.product.image;
     let name = this.props.product.name;
     let price = this.props.product.price;
     let id = this.props.product.id;
     return (
       <div className="product">
         <div className="product-image">
-          <img src={image} alt={name} onClick={this.quickView.bind(this)}/>
+          <ProductImage product={this.props.product} size="medium" alt={name} onClick={this.quickView.bind(this)}/>
         </div>
         <h4 className="product-name">{name}</h4>
         <p className="product-price currency">{price}</p>
@@ -0,0 +1,16 @@
+import React from 'react';
+
+const ProductImage = ({product, size, ...props}) => {
+  let thumbnail = product.thumbnails && product.thumbnails[size];
+  if (!thumbnail){
+    return <img src={product.image} {...props}/>;
+  }
+  return (
+    <picture>
+      <source srcSet={thumbnail.webp} type="image/webp"/>
+      <img src={thumbnail.src} {...props}/>
+    </picture>
+  )
+};
+
+export default ProductImage;
@@ -2,6 +2,7 @@ import React,{Component} from 'react';
 import {Modal} from 'react-bootstrap';
 import {Table} from 'react-bootstrap';
 import {Button} from 'react-bootstrap';
+import ProductImage from './ProductImage';
 
 class QuickView extends Component{
   render(){
@@ -17,7 +18,7 @@ class QuickView extends Component{
         </Modal.Header>
         <Modal.Body>
           <center>
-            <img src={this.props.product.image} style={imageSizing}/>
+            <ProductImage product={this.props.product} size="medium" style={imageSizing}/>
             <div className="container-fluid">
               <Table responsive>
                 <thead>
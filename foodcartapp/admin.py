@@ -4,8 +4,21 @@ from django.templatetags.static import static
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
-from .models import (Order, OrderItem, Product, ProductCategory, Restaurant,
+from .models import (ArchivedOrder, ArchivedOrderItem, Banner, Order,
+                     OrderItem, Product, ProductCategory, Restaurant,
                      RestaurantMenuItem)
+from .thumbnails import get_thumbnails
+
+
+def format_thumbnail(image, size, img_template):
+    thumbnail = get_thumbnails(image).get(size)
+    if not thumbnail:
+        return format_html(img_template, src=image.url)
+    return format_html(
+        '<picture><source srcset="{webp}" type="image/webp">{img}</picture>',
+        webp=thumbnail['webp'],
+        img=format_html(img_template, src=thumbnail['src']),
+    )
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -25,6 +38,10 @@ class RestaurantAdmin(admin.ModelAdmin):
         'address',
         'contact_phone',
     ]
+    readonly_fields = [
+        'lon',
+        'lat',
+    ]
     inlines = [
         RestaurantMenuItemInline
     ]
@@ -89,9 +106,10 @@ class ProductAdmin(admin.ModelAdmin):
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html(
-            '<img src="{url}" style="max-height: 200px;"/>',
-            url=obj.image.url
+        return format_thumbnail(
+            obj.image,
+            'medium',
+            '<img src="{src}" style="max-height: 200px;"/>',
         )
     get_image_preview.short_description = 'превью'
 
@@ -100,8 +118,13 @@ class ProductAdmin(admin.ModelAdmin):
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
         return format_html(
-            '<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>',
-            edit_url=edit_url, src=obj.image.url
+            '<a href="{edit_url}">{preview}</a>',
+            edit_url=edit_url,
+            preview=format_thumbnail(
+                obj.image,
+                'small',
+                '<img src="{src}" style="max-height: 50px;"/>',
+            ),
         )
     get_image_list_preview.short_description = 'превью'
 
@@ -111,6 +134,45 @@ class ProductCategoryAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'get_image_list_preview',
+        'title',
+        'text',
+        'position',
+        'is_active',
+    ]
+    list_display_links = [
+        'title',
+    ]
+    list_editable = [
+        'position',
+        'is_active',
+    ]
+    readonly_fields = [
+        'get_image_preview',
+    ]
+
+    def get_image_preview(self, obj):
+        if not obj.image:
+            return 'выберите картинку'
+        return format_html(
+            '<img src="{url}" style="max-height: 200px;"/>',
+            url=obj.image.url
+        )
+    get_image_preview.short_description = 'превью'
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return format_html(
+            '<img src="{src}" style="max-height: 50px;"/>',
+            src=obj.image.url
+        )
+    get_image_list_preview.short_description = 'превью'
+
+
 class ItemsInline(admin.TabularInline):
     fields = ('product', 'quantity', 'price')
     model = OrderItem
@@ -121,6 +183,11 @@ class ItemsInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    readonly_fields = [
+        'total',
+        'lon',
+        'lat',
+    ]
     inlines = [
         ItemsInline,
     ]
@@ -134,3 +201,47 @@ class OrderAdmin(admin.ModelAdmin):
             return redirect(request.GET['next'])
         else:
             return res
+
+
+class ArchivedItemsInline(admin.TabularInline):
+    fields = ('product', 'quantity', 'price')
+    model = ArchivedOrderItem
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'firstname',
+        'lastname',
+        'phonenumber',
+        'address',
+        'total',
+        'registered_at',
+    ]
+    search_fields = [
+        'id',
+        'phonenumber',
+        'lastname',
+        'address',
+    ]
+    date_hierarchy = 'registered_at'
+    inlines = [
+        ArchivedItemsInline,
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
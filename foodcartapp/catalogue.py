@@ -0,0 +1,258 @@
+import hashlib
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import (Banner, CatalogueChange, CatalogueChangesCounter,
+                     Product, Restaurant, RestaurantMenuItem)
+from .serialization import dump_json
+from .thumbnails import create_thumbnails, get_thumbnails
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+BANNERS_KEY = 'catalogue:banners'
+
+
+def get_catalogue_version():
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(
+            CATALOGUE_VERSION_KEY,
+            time.time_ns(),
+            timeout=settings.CATALOGUE_CACHE_TIMEOUT,
+        )
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        cache.set(
+            CATALOGUE_VERSION_KEY,
+            time.time_ns(),
+            timeout=settings.CATALOGUE_CACHE_TIMEOUT,
+        )
+
+
+class CatalogueChangesExpired(Exception):
+    pass
+
+
+def dump_products(restaurant_id=None, product_ids=None):
+    menu_items = RestaurantMenuItem.objects.filter(
+        availability=True
+    ).select_related(
+        'product__category',
+        'restaurant',
+    ).order_by('product_id', 'restaurant__name')
+    if restaurant_id is not None:
+        Restaurant.objects.get(pk=restaurant_id)
+        menu_items = menu_items.filter(restaurant_id=restaurant_id)
+    if product_ids is not None:
+        menu_items = menu_items.filter(product_id__in=product_ids)
+
+    dumped_products = {}
+    for menu_item in menu_items:
+        product = menu_item.product
+        if product.id not in dumped_products:
+            dumped_products[product.id] = {
+                'id': product.id,
+                'name': product.name,
+                'price': product.price,
+                'special_status': product.special_status,
+                'description': product.description,
+                'category': {
+                    'id': product.category.id,
+                    'name': product.category.name,
+                } if product.category else None,
+                'image': product.image.url,
+                'thumbnails': get_thumbnails(product.image),
+                'restaurants': [],
+            }
+        dumped_products[product.id]['restaurants'].append({
+            'id': menu_item.restaurant.id,
+            'name': menu_item.restaurant.name,
+        })
+    return list(dumped_products.values())
+
+
+def assign_catalogue_change_versions():
+    # счётчик под блокировкой выдаёт версии в порядке коммитов, поэтому
+    # клиент не пропустит изменение, закоммиченное позже соседнего
+    with transaction.atomic():
+        counter, _ = CatalogueChangesCounter.objects.select_for_update(
+        ).get_or_create(pk=1)
+        version = counter.last_version + 1
+        assigned = CatalogueChange.objects.filter(
+            version__isnull=True,
+        ).update(version=version)
+        if assigned:
+            counter.last_version = version
+            counter.save(update_fields=['last_version'])
+    if assigned:
+        bump_catalogue_version()
+
+
+def record_catalogue_changes(product_ids):
+    CatalogueChange.objects.bulk_create([
+        CatalogueChange(product_id=product_id)
+        for product_id in set(product_ids)
+    ])
+    transaction.on_commit(assign_catalogue_change_versions)
+
+
+def get_last_change_version():
+    return CatalogueChangesCounter.objects.filter(pk=1).values_list(
+        'last_version',
+        flat=True,
+    ).first() or 0
+
+
+def dump_product_changes(since):
+    last_version = get_last_change_version()
+    first_version = CatalogueChange.objects.aggregate(
+        first_version=Min('version'),
+    )['first_version'] or last_version + 1
+    # версии идут подряд, пропуск означает удалённую историю
+    if since > last_version or 0 < since < first_version - 1:
+        raise CatalogueChangesExpired()
+
+    if not since:
+        return {
+            'version': last_version,
+            'changed': dump_products(),
+            'removed': [],
+        }
+
+    product_ids = set(
+        CatalogueChange.objects.filter(
+            version__gt=since,
+            version__lte=last_version,
+        ).values_list('product_id', flat=True)
+    )
+    changed_products = dump_products(product_ids=product_ids) if product_ids else []
+    return {
+        'version': last_version,
+        'changed': changed_products,
+        'removed': sorted(
+            product_ids - {product['id'] for product in changed_products}
+        ),
+    }
+
+
+def dump_availability_matrix():
+    restaurant_ids = list(
+        Restaurant.objects.order_by('name').values_list('id', flat=True)
+    )
+    product_ids = list(
+        Product.objects.order_by('id').values_list('id', flat=True)
+    )
+    width = len(restaurant_ids)
+    columns = {
+        restaurant_id: column
+        for column, restaurant_id in enumerate(restaurant_ids)
+    }
+    rows = {product_id: row for row, product_id in enumerate(product_ids)}
+
+    # по байту на пару товар-ресторан, строка матрицы — товар
+    matrix = bytearray(len(product_ids) * width)
+    available_items = RestaurantMenuItem.objects.filter(
+        availability=True
+    ).values_list('product_id', 'restaurant_id')
+    for product_id, restaurant_id in available_items:
+        # товар или ресторан могли появиться уже после выборки выше
+        if product_id not in rows or restaurant_id not in columns:
+            continue
+        matrix[rows[product_id] * width + columns[restaurant_id]] = 1
+    return {
+        'restaurant_ids': restaurant_ids,
+        'product_ids': product_ids,
+        'matrix': bytes(matrix),
+    }
+
+
+def get_availability_matrix():
+    cache_key = f'catalogue:availability:{get_catalogue_version()}'
+    availability = cache.get(cache_key)
+    if availability is None:
+        availability = dump_availability_matrix()
+        cache.set(
+            cache_key,
+            availability,
+            timeout=settings.CATALOGUE_CACHE_TIMEOUT,
+        )
+    return availability
+
+
+def dump_banners():
+    return [
+        {
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        }
+        for banner in Banner.objects.filter(is_active=True)
+    ]
+
+
+def get_cached_payload(cache_key, dump):
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return payload
+
+    content = dump_json(dump())
+    payload = {
+        'content': content,
+        'etag': hashlib.sha1(content).hexdigest(),
+        'last_modified': timezone.now(),
+    }
+    cache.set(cache_key, payload, timeout=settings.CATALOGUE_CACHE_TIMEOUT)
+    return payload
+
+
+def get_products_catalogue(restaurant_id=None):
+    return get_cached_payload(
+        f'catalogue:products:{get_catalogue_version()}:{restaurant_id}',
+        partial(dump_products, restaurant_id),
+    )
+
+
+def get_product_changes(since):
+    return get_cached_payload(
+        f'catalogue:changes:{get_catalogue_version()}:{since}',
+        partial(dump_product_changes, since),
+    )
+
+
+def get_banners():
+    return get_cached_payload(BANNERS_KEY, dump_banners)
+
+
+def invalidate_banners():
+    cache.delete(BANNERS_KEY)
+
+
+def create_products_thumbnails(products):
+    product_ids_by_image = defaultdict(set)
+    for product in products:
+        if product.image:
+            product_ids_by_image[product.image.name].add(product.id)
+
+    changed_product_ids = set()
+    for image_name, product_ids in product_ids_by_image.items():
+        try:
+            if create_thumbnails(image_name):
+                changed_product_ids.update(product_ids)
+        except OSError:
+            continue
+    if changed_product_ids:
+        # клиенты хранят каталог у себя и узнают о превью из ленты изменений
+        record_catalogue_changes(changed_product_ids)
+    return len(changed_product_ids)
@@ -0,0 +1,68 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+
+
+def get_request_hash(request):
+    dumped_data = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(dumped_data.encode()).hexdigest()
+
+
+def get_stored_response(key, request_hash):
+    stored_key = IdempotencyKey.objects.filter(
+        key=key,
+        created_at__gte=timezone.now() - settings.IDEMPOTENCY_KEY_TTL,
+    ).first()
+    if not stored_key:
+        return None
+    if stored_key.request_hash != request_hash:
+        return Response(
+            {'detail': 'Ключ идемпотентности уже использован с другим запросом'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(stored_key.response_body, status=stored_key.response_status)
+
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({IDEMPOTENCY_KEY_HEADER: 'Слишком длинный ключ'})
+
+        request_hash = get_request_hash(request)
+        stored_response = get_stored_response(key, request_hash)
+        if stored_response:
+            return stored_response
+
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.filter(key=key).delete()
+                response = view(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    IdempotencyKey.objects.create(
+                        key=key,
+                        request_hash=request_hash,
+                        response_status=response.status_code,
+                        response_body=response.data,
+                    )
+        except IntegrityError:
+            stored_response = get_stored_response(key, request_hash)
+            if not stored_response:
+                raise
+            return stored_response
+        return response
+    return wrapper
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.models import Order, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые завершённые заказы в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDERS_ARCHIVE_AFTER_DAYS,
+            help='Через сколько дней после регистрации заказ уходит в архив',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько заказов переносить за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        registered_before = timezone.now() - timedelta(days=options['days'])
+        orders = Order.objects.archivable(registered_before).order_by('pk')
+        archived_count = 0
+        while True:
+            archived = archive_orders(orders[:options['batch_size']])
+            if not archived:
+                break
+            archived_count += archived
+        self.stdout.write(f'Перенесено в архив заказов: {archived_count}')
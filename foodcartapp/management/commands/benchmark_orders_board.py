@@ -0,0 +1,174 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from foodcartapp.models import Order
+
+BENCHMARK_FIRSTNAME = 'Тест'
+BENCHMARK_LASTNAME = 'benchmark'
+BENCHMARK_PHONENUMBER = '+79000000000'
+
+
+def get_benchmark_orders():
+    return Order.objects.filter(
+        firstname=BENCHMARK_FIRSTNAME,
+        lastname=BENCHMARK_LASTNAME,
+        phonenumber=BENCHMARK_PHONENUMBER,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает план и время запросов страницы заказов менеджера. '
+        'Запускайте на копии базы: с --seed команда добавляет тестовые заказы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Сколько тестовых заказов добавить перед замером',
+        )
+        parser.add_argument(
+            '--open-share',
+            type=float,
+            default=0.01,
+            help='Доля незавершённых заказов среди тестовых',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=20,
+            help='Сколько раз выполнить каждый запрос',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=50,
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Удалить тестовые заказы после замера',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help=(
+                'Добавить тестовые заказы, даже если DEBUG выключен '
+                'или в базе есть настоящие заказы'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            if not options['force']:
+                self.check_seed_allowed()
+            self.seed_orders(options['seed'], options['open_share'])
+        try:
+            self.benchmark(options['page_size'], options['runs'])
+        finally:
+            if options['cleanup']:
+                self.cleanup_orders()
+
+    def check_seed_allowed(self):
+        if not settings.DEBUG:
+            raise CommandError(
+                'DEBUG выключен, похоже на боевую базу. Запустите команду '
+                'на копии базы с DEBUG=True или добавьте --force'
+            )
+        real_orders = Order.objects.exclude(
+            firstname=BENCHMARK_FIRSTNAME,
+            lastname=BENCHMARK_LASTNAME,
+            phonenumber=BENCHMARK_PHONENUMBER,
+        )
+        if real_orders.exists():
+            raise CommandError(
+                'В базе есть настоящие заказы. Запустите команду на копии '
+                'базы или добавьте --force'
+            )
+
+    def benchmark(self, page_size, runs):
+        open_orders = Order.objects.open()
+        first_page = open_orders.ordered_for_board()[:page_size]
+        queries = {
+            'первая страница': first_page,
+            'фильтр по статусу и дате': open_orders.filter(
+                status='2',
+                registered_at__gte=timezone.now() - timedelta(days=30),
+            ).ordered_for_board()[:page_size],
+        }
+        last_order = list(first_page)[-1:]
+        if last_order:
+            queries['следующая страница'] = open_orders.after_board_position(
+                last_order[0].status,
+                last_order[0].registered_at,
+                last_order[0].id,
+            ).ordered_for_board()[:page_size]
+
+        self.stdout.write(
+            f'{connection.vendor}: заказов {Order.objects.count()}, '
+            f'незавершённых {open_orders.count()}'
+        )
+        for name, queryset in queries.items():
+            self.stdout.write(f'\n== {name}')
+            self.stdout.write(self.explain(queryset))
+            timings = []
+            for _ in range(runs):
+                started_at = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started_at) * 1000)
+            self.stdout.write(
+                f'медиана {statistics.median(timings):.2f} мс, '
+                f'максимум {max(timings):.2f} мс'
+            )
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    def seed_orders(self, count, open_share, batch_size=10000):
+        now = timezone.now()
+        open_statuses = [
+            status for status, _ in Order.STATUS_CHOICES
+            if status != Order.COMPLETED_STATUS
+        ]
+        for batch_start in range(0, count, batch_size):
+            orders = []
+            for _ in range(min(batch_size, count - batch_start)):
+                if random.random() < open_share:
+                    status = random.choice(open_statuses)
+                else:
+                    status = Order.COMPLETED_STATUS
+                orders.append(Order(
+                    firstname=BENCHMARK_FIRSTNAME,
+                    lastname=BENCHMARK_LASTNAME,
+                    phonenumber=BENCHMARK_PHONENUMBER,
+                    address='Москва',
+                    status=status,
+                    registered_at=now - timedelta(
+                        seconds=random.randint(0, 365 * 24 * 60 * 60)
+                    ),
+                ))
+            Order.objects.bulk_create(orders)
+            self.stdout.write(f'Добавлено заказов: {batch_start + len(orders)}')
+
+    def cleanup_orders(self, batch_size=10000):
+        deleted = 0
+        while True:
+            order_ids = list(
+                get_benchmark_orders().values_list('pk', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+            Order.objects.filter(pk__in=order_ids).delete()
+            deleted += len(order_ids)
+        self.stdout.write(f'Удалено тестовых заказов: {deleted}')
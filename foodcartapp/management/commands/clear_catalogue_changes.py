@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.models import CatalogueChange
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие записи ленты изменений каталога'
+
+    def handle(self, *args, **options):
+        deleted, _ = CatalogueChange.objects.filter(
+            created_at__lt=timezone.now() - settings.CATALOGUE_CHANGES_TTL,
+            version__isnull=False,
+        ).delete()
+        self.stdout.write(f'Удалено записей: {deleted}')
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие ключи идемпотентности'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(
+            created_at__lt=timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+        ).delete()
+        self.stdout.write(f'Удалено ключей: {deleted}')
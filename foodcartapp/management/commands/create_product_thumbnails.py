@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.catalogue import create_products_thumbnails
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие превью картинок товаров'
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').only('id', 'image')
+        updated = create_products_thumbnails(products)
+        self.stdout.write(f'Созданы превью для товаров: {updated}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order, update_restaurant_candidates
+
+
+class Command(BaseCommand):
+    help = 'Подбирает рестораны для заказов, у которых подбор устарел'
+
+    def handle(self, *args, **options):
+        orders = list(
+            Order.objects.open().filter(candidates_updated_at__isnull=True)
+        )
+        update_restaurant_candidates(orders)
+        self.stdout.write(f'Обновлено заказов: {len(orders)}')
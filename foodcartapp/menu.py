@@ -0,0 +1,140 @@
+import csv
+import io
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .catalogue import (bump_catalogue_version, get_availability_matrix,
+                        record_catalogue_changes)
+from .models import (Order, Product, Restaurant, RestaurantMenuItem,
+                     schedule_restaurant_candidates_update)
+
+AVAILABILITY_VALUES = {
+    '1': True,
+    '0': False,
+}
+
+
+def set_menu_availability(changes):
+    # изменение без ресторана касается товара во всех ресторанах сети
+    chain_changes = {}
+    menu_items = {}
+    for change in changes:
+        if change.get('restaurant') is None:
+            chain_changes[change['product']] = change['availability']
+        else:
+            menu_items[change['restaurant'], change['product']] = (
+                RestaurantMenuItem(
+                    restaurant_id=change['restaurant'],
+                    product_id=change['product'],
+                    availability=change['availability'],
+                )
+            )
+
+    with transaction.atomic():
+        for availability in (True, False):
+            product_ids = [
+                product_id
+                for product_id, product_availability in chain_changes.items()
+                if product_availability == availability
+            ]
+            if product_ids:
+                RestaurantMenuItem.objects.filter(
+                    product_id__in=product_ids,
+                ).update(availability=availability)
+        RestaurantMenuItem.objects.bulk_create(
+            menu_items.values(),
+            update_conflicts=True,
+            # Django 4.1.1 подставляет имена полей в ON CONFLICT как есть
+            unique_fields=['restaurant_id', 'product_id'],
+            update_fields=['availability'],
+        )
+
+        # массовые операции не отправляют сигналы моделей
+        changed_product_ids = {
+            *chain_changes,
+            *(product_id for _, product_id in menu_items),
+        }
+        record_catalogue_changes(changed_product_ids)
+        schedule_restaurant_candidates_update(
+            Order.objects.filter(items__product_id__in=changed_product_ids)
+        )
+        transaction.on_commit(bump_catalogue_version)
+
+
+def dump_availability_csv():
+    availability = get_availability_matrix()
+    restaurant_ids = availability['restaurant_ids']
+    products = Product.objects.in_bulk(availability['product_ids'])
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['id', 'товар', *restaurant_ids])
+    width = len(restaurant_ids)
+    for row, product_id in enumerate(availability['product_ids']):
+        if product_id not in products:
+            continue
+        writer.writerow([
+            product_id,
+            products[product_id].name,
+            *availability['matrix'][row * width:(row + 1) * width],
+        ])
+    return output.getvalue()
+
+
+def parse_availability_csv(content):
+    rows = list(csv.reader(io.StringIO(content)))
+    if not rows or len(rows[0]) < 3:
+        raise ValidationError('В файле нет столбцов с ресторанами')
+
+    try:
+        restaurant_ids = [int(cell) for cell in rows[0][2:]]
+        product_ids = [int(row[0]) for row in rows[1:] if row]
+    except ValueError:
+        raise ValidationError(
+            'Первая строка и первый столбец должны содержать id ресторанов '
+            'и товаров'
+        )
+    unknown_restaurant_ids = set(restaurant_ids) - set(
+        Restaurant.objects.filter(
+            pk__in=restaurant_ids,
+        ).values_list('pk', flat=True)
+    )
+    unknown_product_ids = set(product_ids) - set(
+        Product.objects.filter(
+            pk__in=product_ids,
+        ).values_list('pk', flat=True)
+    )
+    if unknown_restaurant_ids or unknown_product_ids:
+        raise ValidationError(
+            'Неизвестные рестораны: %(restaurants)s, товары: %(products)s',
+            params={
+                'restaurants': ', '.join(
+                    map(str, sorted(unknown_restaurant_ids))
+                ) or '—',
+                'products': ', '.join(
+                    map(str, sorted(unknown_product_ids))
+                ) or '—',
+            },
+        )
+
+    changes = []
+    for line_number, row in enumerate(rows[1:], start=2):
+        if not row:
+            continue
+        # пустая ячейка оставляет наличие товара без изменений
+        for restaurant_id, cell in zip(restaurant_ids, row[2:]):
+            cell = cell.strip()
+            if not cell:
+                continue
+            if cell not in AVAILABILITY_VALUES:
+                raise ValidationError(
+                    'Строка %(line)s: ожидается 1 или 0, получено «%(cell)s»',
+                    params={'line': line_number, 'cell': cell},
+                )
+            changes.append({
+                'restaurant': restaurant_id,
+                'product': int(row[0]),
+                'availability': AVAILABILITY_VALUES[cell],
+            })
+    return changes
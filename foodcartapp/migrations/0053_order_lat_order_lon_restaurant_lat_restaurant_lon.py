@@ -0,0 +1,60 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+def normalize_address(address):
+    return ' '.join(address.lower().split())
+
+
+def fill_coordinates(apps, schema_editor):
+    Location = apps.get_model('locations', 'Location')
+    coordinates = {
+        normalize_address(address): (lon, lat)
+        for address, lon, lat in Location.objects.filter(
+            lon__isnull=False,
+            lat__isnull=False,
+        ).values_list('address', 'lon', 'lat')
+    }
+    for model_name in ['Order', 'Restaurant']:
+        model = apps.get_model('foodcartapp', model_name)
+        instances = []
+        for instance in model.objects.only('address').iterator():
+            address_key = normalize_address(instance.address)
+            if address_key not in coordinates:
+                continue
+            instance.lon, instance.lat = coordinates[address_key]
+            instances.append(instance)
+        model.objects.bulk_update(instances, ['lon', 'lat'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0052_auto_20220827_1157'),
+        ('locations', '0005_geocodingtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='lat',
+            field=models.FloatField(blank=True, null=True, verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='lon',
+            field=models.FloatField(blank=True, null=True, verbose_name='Долгота'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='lat',
+            field=models.FloatField(blank=True, null=True, verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='lon',
+            field=models.FloatField(blank=True, null=True, verbose_name='Долгота'),
+        ),
+        migrations.RunPython(fill_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:24
+
+from django.contrib.staticfiles import finders
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+BANNERS = [
+    ('Burger', 'burger.jpg', 'Tasty Burger at your door step'),
+    ('Spices', 'food.jpg', 'All Cuisines'),
+    ('New York', 'tasty.jpg', 'Food is incomplete without a tasty dessert'),
+]
+
+
+def create_banners(apps, schema_editor):
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    for position, (title, image_name, text) in enumerate(BANNERS):
+        saved_name = f'banners/{image_name}'
+        # миграция выполняется и для каждой тестовой базы: не плодим копии
+        if not default_storage.exists(saved_name):
+            image_path = finders.find(image_name)
+            if not image_path:
+                continue
+            with open(image_path, 'rb') as image:
+                saved_name = default_storage.save(saved_name, File(image))
+        Banner.objects.create(
+            title=title,
+            text=text,
+            image=saved_name,
+            position=position,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0053_order_lat_order_lon_restaurant_lat_restaurant_lon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Banner',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=50, verbose_name='заголовок')),
+                ('text', models.CharField(blank=True, max_length=200, verbose_name='текст')),
+                ('image', models.ImageField(upload_to='banners', verbose_name='картинка')),
+                ('position', models.PositiveIntegerField(db_index=True, default=0, verbose_name='позиция')),
+                ('is_active', models.BooleanField(db_index=True, default=True, verbose_name='показывать')),
+            ],
+            options={
+                'verbose_name': 'баннер',
+                'verbose_name_plural': 'баннеры',
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.RunPython(create_banners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:26
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+    items_total = OrderItem.objects.filter(
+        order=OuterRef('pk')
+    ).values('order').annotate(
+        total=Sum(F('price') * F('quantity'))
+    ).values('total')
+    Order.objects.update(
+        total=Coalesce(Subquery(items_total), Value(Decimal(0))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Стоимость заказа'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
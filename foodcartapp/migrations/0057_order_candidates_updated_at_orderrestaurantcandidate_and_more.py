@@ -0,0 +1,40 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0056_order_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='candidates_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Время подбора ресторанов'),
+        ),
+        migrations.CreateModel(
+            name='OrderRestaurantCandidate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(verbose_name='расстояние, км')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_candidates', to='foodcartapp.order', verbose_name='заказ')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_candidates', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'ресторан для заказа',
+                'verbose_name_plural': 'рестораны для заказов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderrestaurantcandidate',
+            index=models.Index(fields=['order', 'distance'], name='foodcartapp_order_i_afac8a_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='orderrestaurantcandidate',
+            unique_together={('order', 'restaurant')},
+        ),
+    ]
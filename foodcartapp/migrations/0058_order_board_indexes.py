@@ -0,0 +1,43 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_order_candidates_updated_at_orderrestaurantcandidate_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='called_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время и дата звонка оператора'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время и дата доставки'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='payment_option',
+            field=models.CharField(choices=[('1', 'Не выбрано'), ('2', 'Наличными'), ('3', 'Электронно')], default='1', max_length=50, verbose_name='Способ оплаты'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='registered_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время и дата регистрации'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('1', 'Необработанный'), ('2', 'В сборке'), ('3', 'Передан в доставку'), ('4', 'Завершен')], default='1', max_length=50, verbose_name='Статус'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', '4'), _negated=True), fields=['status', 'registered_at', 'id'], name='order_open_board_idx'),
+        ),
+    ]
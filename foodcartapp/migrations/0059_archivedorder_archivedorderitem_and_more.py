@@ -0,0 +1,76 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import phonenumber_field.modelfields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0058_order_board_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('firstname', models.CharField(max_length=50, verbose_name='Имя')),
+                ('lastname', models.CharField(max_length=50, verbose_name='Фамилия')),
+                ('phonenumber', phonenumber_field.modelfields.PhoneNumberField(db_index=True, max_length=128, region=None, verbose_name='Номер телефона')),
+                ('address', models.CharField(max_length=100, verbose_name='Адрес доставки')),
+                ('status', models.CharField(choices=[('1', 'Необработанный'), ('2', 'В сборке'), ('3', 'Передан в доставку'), ('4', 'Завершен')], default='1', max_length=50, verbose_name='Статус')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('registered_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время и дата регистрации')),
+                ('called_at', models.DateTimeField(blank=True, null=True, verbose_name='Время и дата звонка оператора')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Время и дата доставки')),
+                ('payment_option', models.CharField(choices=[('1', 'Не выбрано'), ('2', 'Наличными'), ('3', 'Электронно')], default='1', max_length=50, verbose_name='Способ оплаты')),
+                ('total', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Стоимость заказа')),
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='Номер заказа')),
+                ('lon', models.FloatField(blank=True, null=True, verbose_name='Долгота')),
+                ('lat', models.FloatField(blank=True, null=True, verbose_name='Широта')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время переноса в архив')),
+            ],
+            options={
+                'verbose_name': 'архивный заказ',
+                'verbose_name_plural': 'архивные заказы',
+                'ordering': ['-registered_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Цена товара')),
+                ('quantity', models.IntegerField(verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'пункт архивного заказа',
+                'verbose_name_plural': 'пункты архивного заказа',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', '4')), fields=['registered_at'], name='order_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='foodcartapp.archivedorder', verbose_name='заказ'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_items', to='foodcartapp.product', verbose_name='товар'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='preparing_restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='foodcartapp.restaurant', verbose_name='Готовил ресторан:'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['registered_at'], name='foodcartapp_registe_f1aa77_idx'),
+        ),
+    ]
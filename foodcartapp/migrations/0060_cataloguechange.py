@@ -0,0 +1,26 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0059_archivedorder_archivedorderitem_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('product_id', models.IntegerField(verbose_name='id товара')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='время изменения')),
+            ],
+            options={
+                'verbose_name': 'изменение каталога',
+                'verbose_name_plural': 'изменения каталога',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.1 on 2026-10-18 22:41
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_cataloguechange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Время изменения'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:46
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def fill_versions(apps, schema_editor):
+    CatalogueChange = apps.get_model('foodcartapp', 'CatalogueChange')
+    CatalogueChangesCounter = apps.get_model(
+        'foodcartapp',
+        'CatalogueChangesCounter',
+    )
+    # клиенты уже знают версии, равные номерам записей
+    CatalogueChange.objects.update(version=F('id'))
+    last_version = CatalogueChange.objects.aggregate(
+        last_version=Max('id'),
+    )['last_version']
+    CatalogueChangesCounter.objects.create(pk=1, last_version=last_version or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0061_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueChangesCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_version', models.BigIntegerField(default=0, verbose_name='последняя версия каталога')),
+            ],
+            options={
+                'verbose_name': 'счётчик версий каталога',
+                'verbose_name_plural': 'счётчик версий каталога',
+            },
+        ),
+        migrations.AddField(
+            model_name='cataloguechange',
+            name='version',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='версия каталога'),
+        ),
+        migrations.RunPython(fill_versions, migrations.RunPython.noop),
+    ]
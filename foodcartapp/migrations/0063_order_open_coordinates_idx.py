@@ -0,0 +1,17 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0062_cataloguechange_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', '4'), _negated=True), fields=['lat', 'lon'], name='order_open_coordinates_idx'),
+        ),
+    ]
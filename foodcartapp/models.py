@@ -1,14 +1,92 @@
+from collections import defaultdict
+from decimal import Decimal
+from operator import itemgetter
+
+from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import F, Sum
+from django.db import models, transaction
+from django.db.models import (F, OuterRef, Prefetch, Q, Subquery, Sum, Value,
+                              prefetch_related_objects)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
-from locations.distance_operations import get_coordinates, measure_distance
-from locations.models import Location
+from locations.distance_matrix import (get_bounding_box, get_distance_matrix,
+                                       get_distances_within_radius)
+from locations.distance_operations import (enqueue_addresses,
+                                           get_cached_coordinates,
+                                           get_coordinates)
+from locations.spatial_index import GridIndex
 
 
-class Restaurant(models.Model):
+class GeolocatedModel(models.Model):
+    lon = models.FloatField(
+        'Долгота',
+        null=True,
+        blank=True,
+    )
+    lat = models.FloatField(
+        'Широта',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_address = instance.__dict__.get('address')
+        lon, lat = instance.__dict__.get('lon'), instance.__dict__.get('lat')
+        instance._saved_coordinates = (
+            None if lon is None or lat is None else (lon, lat)
+        )
+        return instance
+
+    @property
+    def coordinates(self):
+        if self.lon is None or self.lat is None:
+            return None
+        return self.lon, self.lat
+
+    def save(self, *args, **kwargs):
+        self.is_address_changed = (
+            self.address != getattr(self, '_saved_address', None)
+        )
+        if self.is_address_changed:
+            coordinates = get_cached_coordinates([self.address])
+            self.lon, self.lat = (
+                get_coordinates(self.address, coordinates) or (None, None)
+            )
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'lon', 'lat'}
+            if not self.coordinates:
+                address = self.address
+                transaction.on_commit(lambda: enqueue_addresses([address]))
+        self.previous_coordinates = getattr(self, '_saved_coordinates', None)
+        super().save(*args, **kwargs)
+        self._saved_address = self.address
+        self._saved_coordinates = self.coordinates
+
+
+def set_coordinates(instances, coordinates):
+    located_instances = []
+    for instance in instances:
+        instance_coordinates = get_coordinates(instance.address, coordinates)
+        if instance_coordinates:
+            instance.lon, instance.lat = instance_coordinates
+            located_instances.append(instance)
+    if located_instances:
+        type(located_instances[0]).objects.bulk_update(
+            located_instances,
+            ['lon', 'lat'],
+        )
+    return located_instances
+
+
+class Restaurant(GeolocatedModel):
     name = models.CharField(
         'название',
         max_length=50
@@ -34,12 +112,7 @@ class Restaurant(models.Model):
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
-        )
-        return self.filter(pk__in=products)
+        return self.filter(menu_items__availability=True).distinct()
 
 
 class ProductCategory(models.Model):
@@ -58,61 +131,217 @@ class ProductCategory(models.Model):
 
 class OrderQuerySet(models.QuerySet):
 
-    def get_order_value(self):
-        return self.annotate(
-            total=Sum(F('items__price')*F('items__quantity'))
+    def open(self):
+        return self.exclude(status=Order.COMPLETED_STATUS)
+
+    def ordered_for_board(self):
+        return self.order_by('status', 'registered_at', 'id')
+
+    def after_board_position(self, status, registered_at, order_id):
+        return self.filter(
+            Q(status__gt=status)
+            | Q(status=status, registered_at__gt=registered_at)
+            | Q(status=status, registered_at=registered_at, id__gt=order_id)
         )
 
-    def get_closest_restaurants(self):
-        rest_items = RestaurantMenuItem.objects.filter(
-            availability=True
-        ).prefetch_related('product').prefetch_related('restaurant')
-        
-        restaurants = Restaurant.objects.all()
-        addresses = [order.address for order in self]
-        restaurant_addresses = [restaurant.address for restaurant in restaurants.iterator()]
-        addresses.extend(restaurant_addresses)
-        locations = list(Location.objects.filter(address__in=addresses))
-        for order in self:
-            order_coordinates = get_coordinates(order.address, locations)
-            if not order_coordinates:
-                continue
-            order_items = order.items.prefetch_related('product')
-            restaurants_per_item = []
-            for order_item in order_items.iterator():
-                restaurants_per_item.append([
-                    rest_item.restaurant for rest_item in rest_items.iterator()
-                    if rest_item.product.id == order_item.product.id
-                ])
-            available_restaurants = set(restaurants_per_item[0]).intersection(
-                *restaurants_per_item
+    def archivable(self, registered_before):
+        return self.filter(
+            status=Order.COMPLETED_STATUS,
+            registered_at__lt=registered_before,
+        )
+
+    def near(self, points, radius):
+        points = [point for point in points if point]
+        if not points:
+            return self.none()
+        bounding_boxes = Q()
+        for lon, lat in points:
+            min_lon, max_lon, min_lat, max_lat = get_bounding_box(
+                lon,
+                lat,
+                radius,
             )
-            restaurants_with_distance = []
-            for restaurant in available_restaurants:
-                rest_coordinates = get_coordinates(restaurant.address, locations)
-                distance = measure_distance(
-                    order_coordinates, rest_coordinates
-                )
-                restaurants_with_distance.append(
-                    {
-                        'name': restaurant.name,
-                        'distance': distance
-                    }
-                )
-            order.restaurants = sorted(
-                restaurants_with_distance,
-                key=lambda restaurant: restaurant['distance']
+            bounding_boxes |= Q(
+                lon__range=(min_lon, max_lon),
+                lat__range=(min_lat, max_lat),
             )
+        located_orders = list(
+            self.filter(bounding_boxes).values_list('pk', 'lon', 'lat')
+        )
+        if not located_orders:
+            return self.none()
+        rows, _, _ = get_distances_within_radius(
+            [(lon, lat) for _, lon, lat in located_orders],
+            points,
+            radius,
+        )
+        return self.filter(
+            pk__in={located_orders[row][0] for row in rows.tolist()}
+        )
+
+    def update_totals(self):
+        items_total = OrderItem.objects.filter(
+            order=OuterRef('pk')
+        ).values('order').annotate(
+            total=Sum(F('price') * F('quantity'))
+        ).values('total')
+        return self.update(
+            total=Coalesce(Subquery(items_total), Value(Decimal(0))),
+            updated_at=timezone.now(),
+        )
+
+    def get_closest_restaurants(self):
+        find_closest_restaurants(self)
         return self
 
 
-class Order(models.Model):
+def get_closest_restaurants_ids(order, availability_index, restaurants,
+                                restaurants_index):
+    restaurants_per_item = [
+        availability_index.get(order_item.product_id, frozenset())
+        for order_item in order.items.all()
+    ]
+    if not restaurants_per_item:
+        return []
+    available_restaurants = restaurants_per_item[0].intersection(
+        *restaurants_per_item[1:]
+    )
+    closest_restaurants = restaurants_index.nearest(
+        *order.coordinates,
+        k=settings.CLOSEST_RESTAURANTS_COUNT,
+        radius=settings.DELIVERY_RADIUS,
+        predicate=available_restaurants.__contains__,
+    )
+    if settings.DISTANCE_ACCURATE and closest_restaurants:
+        restaurants_ids = [restaurant_id for restaurant_id, _ in closest_restaurants]
+        distances = get_distance_matrix(
+            [order.coordinates],
+            [
+                restaurants[restaurant_id].coordinates
+                for restaurant_id in restaurants_ids
+            ],
+            accurate=True,
+        )[0]
+        closest_restaurants = sorted(
+            zip(restaurants_ids, distances.tolist()),
+            key=itemgetter(1),
+        )
+    return closest_restaurants
+
+
+def update_restaurant_candidates(orders):
+    orders = list(orders)
+    if not orders:
+        return
+
+    prefetch_related_objects(orders, 'items')
+    availability_index = RestaurantMenuItem.objects.get_availability_index()
+    restaurants = Restaurant.objects.filter(
+        lon__isnull=False,
+        lat__isnull=False,
+    ).in_bulk()
+    # индекс строим на каждый вызов: общий индекс меняли бы параллельные потоки
+    restaurants_index = GridIndex()
+    restaurants_index.sync({
+        restaurant.id: restaurant.coordinates
+        for restaurant in restaurants.values()
+    })
+
+    candidates = []
+    for order in orders:
+        if not order.coordinates:
+            continue
+        closest_restaurants = get_closest_restaurants_ids(
+            order,
+            availability_index,
+            restaurants,
+            restaurants_index,
+        )
+        candidates.extend(
+            OrderRestaurantCandidate(
+                order=order,
+                restaurant_id=restaurant_id,
+                distance=distance,
+            )
+            for restaurant_id, distance in closest_restaurants
+        )
+
+    updated_at = timezone.now()
+    with transaction.atomic():
+        OrderRestaurantCandidate.objects.filter(order__in=orders).delete()
+        OrderRestaurantCandidate.objects.bulk_create(candidates)
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+            candidates_updated_at=updated_at,
+            updated_at=updated_at,
+        )
+    for order in orders:
+        order.candidates_updated_at = updated_at
+        order.updated_at = updated_at
+
+
+def schedule_restaurant_candidates_update(orders):
+    orders = orders.exclude(status=Order.COMPLETED_STATUS)
+    order_ids = list(orders.values_list('pk', flat=True))
+    if not order_ids:
+        return
+    Order.objects.filter(pk__in=order_ids).update(candidates_updated_at=None)
+    transaction.on_commit(
+        lambda: update_restaurant_candidates(
+            Order.objects.filter(
+                pk__in=order_ids,
+                candidates_updated_at__isnull=True,
+            )
+        )
+    )
+
+
+def find_closest_restaurants(orders):
+    # только чтение: координаты ищет воркер геокодера, а кандидатов
+    # пересчитывают сигналы после коммита
+    orders = list(orders)
+    unlocated_addresses = {
+        order.address for order in orders if not order.coordinates
+    }
+    unlocated_addresses.update(
+        Restaurant.objects.filter(
+            Q(lon__isnull=True) | Q(lat__isnull=True)
+        ).values_list('address', flat=True)
+    )
+    if unlocated_addresses:
+        enqueue_addresses(unlocated_addresses, relocate=True)
+    prefetch_restaurant_candidates(orders)
+
+
+def prefetch_restaurant_candidates(orders):
+    prefetch_related_objects(
+        orders,
+        Prefetch(
+            'restaurant_candidates',
+            queryset=OrderRestaurantCandidate.objects.select_related(
+                'restaurant'
+            ).order_by('distance'),
+        ),
+    )
+    for order in orders:
+        if not order.coordinates:
+            continue
+        order.restaurants = [
+            {
+                'name': candidate.restaurant.name,
+                'distance': candidate.distance,
+            }
+            for candidate in order.restaurant_candidates.all()
+        ]
+
+
+class BaseOrder(models.Model):
     STATUS_CHOICES = [
         ("1", 'Необработанный'),
         ("2", 'В сборке'),
         ("3", 'Передан в доставку'),
         ("4", 'Завершен'),
     ]
+    COMPLETED_STATUS = "4"
     PAYMENT_CHOICES = [
         ("1", 'Не выбрано'),
         ("2", 'Наличными'),
@@ -128,7 +357,6 @@ class Order(models.Model):
         max_length=50,
         choices=STATUS_CHOICES,
         default="1",
-        db_index=True,
     )
     comment = models.TextField(
         'Комментарий',
@@ -137,27 +365,39 @@ class Order(models.Model):
     registered_at = models.DateTimeField(
         'Время и дата регистрации',
         default=timezone.now,
-        db_index=True,
     )
     called_at = models.DateTimeField(
         'Время и дата звонка оператора',
         blank=True,
         null=True,
-        db_index=True,
     )
     delivered_at = models.DateTimeField(
         'Время и дата доставки',
         blank=True,
         null=True,
-        db_index=True,
     )
     payment_option = models.CharField(
         'Способ оплаты',
         max_length=50,
         choices=PAYMENT_CHOICES,
         default="1",
-        db_index=True,
     )
+    total = models.DecimalField(
+        'Стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+    )
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f'{self.firstname} {self.lastname} {self.id}'
+
+
+class Order(GeolocatedModel, BaseOrder):
     preparing_restaurant = models.ForeignKey(
         'Restaurant',
         related_name='orders',
@@ -166,15 +406,40 @@ class Order(models.Model):
         blank=True,
         on_delete=models.DO_NOTHING,
     )
+    candidates_updated_at = models.DateTimeField(
+        'Время подбора ресторанов',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        'Время изменения',
+        auto_now=True,
+        db_index=True,
+    )
 
     objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
-
-    def __str__(self):
-        return f'{self.firstname} {self.lastname} {self.id}'
+        indexes = [
+            models.Index(
+                fields=['status', 'registered_at', 'id'],
+                condition=~Q(status='4'),
+                name='order_open_board_idx',
+            ),
+            models.Index(
+                fields=['registered_at'],
+                condition=Q(status='4'),
+                name='order_completed_idx',
+            ),
+            models.Index(
+                fields=['lat', 'lon'],
+                condition=~Q(status='4'),
+                name='order_open_coordinates_idx',
+            ),
+        ]
 
 
 class Product(models.Model):
@@ -252,6 +517,52 @@ class OrderItem(models.Model):
         return f'{self.product} - {self.order}'
 
 
+class OrderRestaurantCandidate(models.Model):
+    order = models.ForeignKey(
+        Order,
+        verbose_name='заказ',
+        related_name='restaurant_candidates',
+        on_delete=models.CASCADE,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        verbose_name='ресторан',
+        related_name='order_candidates',
+        on_delete=models.CASCADE,
+    )
+    distance = models.FloatField(
+        'расстояние, км',
+    )
+
+    class Meta:
+        verbose_name = 'ресторан для заказа'
+        verbose_name_plural = 'рестораны для заказов'
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+        indexes = [
+            models.Index(fields=['order', 'distance']),
+        ]
+
+    def __str__(self):
+        return f'{self.order} - {self.restaurant}'
+
+
+class RestaurantMenuItemQuerySet(models.QuerySet):
+
+    def get_availability_index(self):
+        availability_index = defaultdict(set)
+        menu_items = self.filter(availability=True).values_list(
+            'product_id', 'restaurant_id'
+        )
+        for product_id, restaurant_id in menu_items:
+            availability_index[product_id].add(restaurant_id)
+        return {
+            product_id: frozenset(restaurant_ids)
+            for product_id, restaurant_ids in availability_index.items()
+        }
+
+
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
         Restaurant,
@@ -271,6 +582,8 @@ class RestaurantMenuItem(models.Model):
         db_index=True
     )
 
+    objects = RestaurantMenuItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'пункт меню ресторана'
         verbose_name_plural = 'пункты меню ресторана'
@@ -280,3 +593,198 @@ class RestaurantMenuItem(models.Model):
 
     def __str__(self):
         return f'{self.restaurant.name} - {self.product.name}'
+
+
+class Banner(models.Model):
+    title = models.CharField(
+        'заголовок',
+        max_length=50,
+    )
+    text = models.CharField(
+        'текст',
+        max_length=200,
+        blank=True,
+    )
+    image = models.ImageField(
+        'картинка',
+        upload_to='banners',
+    )
+    position = models.PositiveIntegerField(
+        'позиция',
+        default=0,
+        db_index=True,
+    )
+    is_active = models.BooleanField(
+        'показывать',
+        default=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.title
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        'ключ',
+        max_length=255,
+        unique=True,
+    )
+    request_hash = models.CharField(
+        'хэш запроса',
+        max_length=64,
+    )
+    response_status = models.PositiveSmallIntegerField(
+        'код ответа',
+    )
+    response_body = models.JSONField(
+        'тело ответа',
+    )
+    created_at = models.DateTimeField(
+        'создан',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
+
+
+class CatalogueChange(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    product_id = models.IntegerField(
+        'id товара',
+    )
+    # версия назначается после коммита, в порядке коммитов
+    version = models.BigIntegerField(
+        'версия каталога',
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+    created_at = models.DateTimeField(
+        'время изменения',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'изменение каталога'
+        verbose_name_plural = 'изменения каталога'
+
+    def __str__(self):
+        return f'{self.version}: {self.product_id}'
+
+
+class CatalogueChangesCounter(models.Model):
+    last_version = models.BigIntegerField(
+        'последняя версия каталога',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'счётчик версий каталога'
+        verbose_name_plural = 'счётчик версий каталога'
+
+    def __str__(self):
+        return str(self.last_version)
+
+
+class ArchivedOrder(BaseOrder):
+    # номер заказа сохраняется при переносе в архив
+    id = models.IntegerField('Номер заказа', primary_key=True)
+    lon = models.FloatField(
+        'Долгота',
+        null=True,
+        blank=True,
+    )
+    lat = models.FloatField(
+        'Широта',
+        null=True,
+        blank=True,
+    )
+    preparing_restaurant = models.ForeignKey(
+        'Restaurant',
+        related_name='archived_orders',
+        verbose_name='Готовил ресторан:',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    archived_at = models.DateTimeField(
+        'Время переноса в архив',
+        default=timezone.now,
+    )
+
+    class Meta:
+        verbose_name = 'архивный заказ'
+        verbose_name_plural = 'архивные заказы'
+        ordering = ['-registered_at']
+        indexes = [
+            models.Index(fields=['registered_at']),
+        ]
+
+
+class ArchivedOrderItem(models.Model):
+    product = models.ForeignKey(
+        Product,
+        verbose_name='товар',
+        related_name='archived_items',
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    order = models.ForeignKey(
+        ArchivedOrder,
+        verbose_name='заказ',
+        related_name='items',
+        on_delete=models.CASCADE,
+    )
+    price = models.DecimalField(
+        'Цена товара',
+        max_digits=8,
+        decimal_places=2,
+    )
+    quantity = models.IntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'пункт архивного заказа'
+        verbose_name_plural = 'пункты архивного заказа'
+
+    def __str__(self):
+        return f'{self.product} - {self.order}'
+
+
+def archive_orders(orders):
+    archived_fields = [
+        field.attname for field in ArchivedOrder._meta.concrete_fields
+        if field.name != 'archived_at'
+    ]
+    with transaction.atomic():
+        orders = list(orders.select_for_update().prefetch_related('items'))
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**{
+                field: getattr(order, field) for field in archived_fields
+            })
+            for order in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                order_id=item.order_id,
+                product_id=item.product_id,
+                price=item.price,
+                quantity=item.quantity,
+            )
+            for order in orders
+            for item in order.items.all()
+        ])
+        Order.objects.filter(pk__in=[order.pk for order in orders]).delete()
+    return len(orders)
@@ -0,0 +1,132 @@
+import gzip
+import json
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESSED_SIZE = 200
+PRETTY_ETAG_SUFFIX = '-pretty'
+
+
+def encode_default(obj):
+    return DjangoJSONEncoder().default(obj)
+
+
+def dump_json(data, pretty=False):
+    if orjson:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(data, default=encode_default, option=option)
+
+    return json.dumps(
+        data,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        indent=2 if pretty else None,
+        separators=None if pretty else (',', ':'),
+    ).encode()
+
+
+def is_pretty_requested(request):
+    return settings.DEBUG and 'pretty' in request.GET
+
+
+def json_response(request, data=None, content=None, **kwargs):
+    if content is None or is_pretty_requested(request):
+        if content is not None:
+            data = json.loads(content)
+        content = dump_json(data, pretty=is_pretty_requested(request))
+    return HttpResponse(content, content_type='application/json', **kwargs)
+
+
+@lru_cache(maxsize=32)
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content)
+    return gzip.compress(content, mtime=0)
+
+
+def parse_accept_encoding(header):
+    qualities = {}
+    for coding_range in header.split(','):
+        coding, *params = coding_range.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() != 'q':
+                continue
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def get_accepted_encoding(request):
+    qualities = parse_accept_encoding(
+        request.headers.get('Accept-Encoding', '')
+    )
+    # q=0 запрещает кодировку, а * задаёт качество для неперечисленных
+    default_quality = qualities.get('*', 0.0)
+    supported_encodings = ['br', 'gzip'] if brotli else ['gzip']
+    # при равном качестве выбираем кодировку, которая идёт в списке раньше
+    encoding = max(
+        supported_encodings,
+        key=lambda encoding: qualities.get(encoding, default_quality),
+    )
+    if qualities.get(encoding, default_quality) <= 0:
+        return None
+    return encoding
+
+
+def get_pretty_etag(etag):
+    # отформатированное тело отличается от обычного, поэтому ETag у них разный
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}{PRETTY_ETAG_SUFFIX}"'
+
+
+def compress_response(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        is_pretty = is_pretty_requested(request)
+        if is_pretty:
+            # отладочный режим всегда отдаёт тело целиком
+            request.META.pop('HTTP_IF_NONE_MATCH', None)
+            request.META.pop('HTTP_IF_MODIFIED_SINCE', None)
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if is_pretty and response.has_header('ETag'):
+            response['ETag'] = get_pretty_etag(response['ETag'])
+        if response.streaming or response.has_header('Content-Encoding') \
+                or len(response.content) < MIN_COMPRESSED_SIZE:
+            return response
+
+        encoding = get_accepted_encoding(request)
+        if not encoding:
+            return response
+
+        response.content = compress(response.content, encoding)
+        response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        return response
+    return wrapper
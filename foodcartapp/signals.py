@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .catalogue import (bump_catalogue_version, create_products_thumbnails,
+                        invalidate_banners, record_catalogue_changes)
+from locations.signals import addresses_geocoded
+
+from .models import (Banner, Order, OrderItem, Product, ProductCategory,
+                     Restaurant, RestaurantMenuItem,
+                     schedule_restaurant_candidates_update, set_coordinates)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_catalogue(sender, **kwargs):
+    # иначе параллельный запрос закэширует каталог до коммита под новой версией
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def record_product_change(sender, instance, **kwargs):
+    record_catalogue_changes([instance.id])
+
+
+@receiver(post_save, sender=Product)
+def create_product_thumbnails(sender, instance, **kwargs):
+    if not instance.image:
+        return
+    transaction.on_commit(lambda: create_products_thumbnails([instance]))
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def record_menu_item_change(sender, instance, **kwargs):
+    record_catalogue_changes([instance.product_id])
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(pre_delete, sender=ProductCategory)
+def record_category_change(sender, instance, **kwargs):
+    record_catalogue_changes(
+        instance.products.values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Restaurant)
+def record_restaurant_change(sender, instance, **kwargs):
+    record_catalogue_changes(
+        instance.menu_items.values_list('product_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_banners_cache(sender, **kwargs):
+    invalidate_banners()
+
+
+def is_deleted_with(origin, model):
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_total(sender, instance, origin=None, **kwargs):
+    if is_deleted_with(origin, Order):
+        return
+    Order.objects.filter(pk=instance.order_id).update_totals()
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_candidates(sender, instance, origin=None, **kwargs):
+    if is_deleted_with(origin, Order):
+        return
+    schedule_restaurant_candidates_update(
+        Order.objects.filter(pk=instance.order_id)
+    )
+
+
+@receiver(post_save, sender=Order)
+def update_moved_order_candidates(sender, instance, created, raw=False,
+                                  **kwargs):
+    # loaddata сохраняет в обход GeolocatedModel.save
+    if raw:
+        return
+    if created or getattr(instance, 'is_address_changed', False):
+        schedule_restaurant_candidates_update(
+            Order.objects.filter(pk=instance.pk)
+        )
+
+
+def update_candidates_near(points, orders=None):
+    if orders is None:
+        orders = Order.objects.all()
+    schedule_restaurant_candidates_update(
+        orders.open().near(points, settings.DELIVERY_RADIUS)
+    )
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def update_product_orders_candidates(sender, instance, origin=None, **kwargs):
+    # заказы рядом с удалённым рестораном пересчитает его собственный сигнал
+    if is_deleted_with(origin, Restaurant):
+        return
+    update_candidates_near(
+        [instance.restaurant.coordinates],
+        Order.objects.filter(items__product_id=instance.product_id),
+    )
+
+
+@receiver(post_save, sender=Restaurant)
+def update_candidates_for_moved_restaurant(sender, instance, raw=False,
+                                           **kwargs):
+    if raw:
+        return
+    previous_coordinates = getattr(instance, 'previous_coordinates', None)
+    if instance.coordinates != previous_coordinates:
+        update_candidates_near([previous_coordinates, instance.coordinates])
+
+
+@receiver(post_delete, sender=Restaurant)
+def update_candidates_for_deleted_restaurant(sender, instance, **kwargs):
+    update_candidates_near([instance.coordinates])
+
+
+@receiver(addresses_geocoded)
+def locate_geocoded_addresses(sender, addresses, coordinates, **kwargs):
+    located_restaurants = set_coordinates(
+        Restaurant.objects.filter(address__in=addresses, lat__isnull=True),
+        coordinates,
+    )
+    located_orders = set_coordinates(
+        Order.objects.filter(address__in=addresses, lat__isnull=True),
+        coordinates,
+    )
+    if located_restaurants:
+        update_candidates_near(
+            [restaurant.coordinates for restaurant in located_restaurants]
+        )
+    if located_orders:
+        schedule_restaurant_candidates_update(
+            Order.objects.filter(pk__in=[order.pk for order in located_orders])
+        )
@@ -0,0 +1,933 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.utils import timezone
+from PIL import Image
+
+from locations.models import GeocodingTask, Location
+from locations.signals import addresses_geocoded
+
+from .models import (ArchivedOrder, CatalogueChange, Order, OrderItem,
+                     Product, Restaurant, RestaurantMenuItem, archive_orders)
+from .menu import parse_availability_csv
+from .serialization import get_accepted_encoding
+from .thumbnails import THUMBNAILS_DIR, get_thumbnails
+
+
+def get_order_data(products, address='Москва, Тверская 1'):
+    return {
+        'firstname': 'Иван',
+        'lastname': 'Петров',
+        'phonenumber': '+79991234567',
+        'address': address,
+        'products': [
+            {'product': product.id, 'quantity': quantity}
+            for product, quantity in products
+        ],
+    }
+
+
+class OrdersApiTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.burger = Product.objects.create(name='Бургер', price=Decimal(300))
+        self.cola = Product.objects.create(name='Кола', price=Decimal(100))
+
+    def post(self, url, data, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                url,
+                data,
+                content_type='application/json',
+                **headers,
+            )
+
+
+class RegisterOrdersBulkTest(OrdersApiTestCase):
+
+    def test_invalid_orders_are_reported_by_index(self):
+        invalid_order = get_order_data([(self.burger, 1)])
+        invalid_order['phonenumber'] = 'не телефон'
+
+        response = self.post('/api/orders/bulk/', [
+            get_order_data([(self.burger, 1)]),
+            invalid_order,
+            get_order_data([(self.cola, 2)]),
+            {'products': [{'product': 0, 'quantity': 1}]},
+            'не заказ',
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(
+            [result['index'] for result in results],
+            [0, 1, 2, 3, 4],
+        )
+        order_ids = Order.objects.order_by('id').values_list('id', flat=True)
+        self.assertEqual(
+            [results[0]['id'], results[2]['id']],
+            list(order_ids),
+        )
+        self.assertEqual(list(results[1]['errors']), ['phonenumber'])
+        self.assertEqual(
+            results[3]['errors']['products'],
+            [{'product': ['Недопустимый первичный ключ 0']}],
+        )
+        self.assertIn('non_field_errors', results[4]['errors'])
+        self.assertEqual(OrderItem.objects.count(), 2)
+
+    def test_empty_list_is_rejected(self):
+        response = self.post('/api/orders/bulk/', [])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(BULK_ORDERS_MAX_COUNT=2)
+    def test_too_many_orders_are_rejected(self):
+        response = self.post(
+            '/api/orders/bulk/',
+            [get_order_data([(self.burger, 1)])] * 3,
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class IdempotentRegisterOrderTest(OrdersApiTestCase):
+
+    def test_same_key_replays_response(self):
+        order_data = get_order_data([(self.burger, 1)])
+
+        first_response = self.post(
+            '/api/order/',
+            order_data,
+            HTTP_IDEMPOTENCY_KEY='order-1',
+        )
+        second_response = self.post(
+            '/api/order/',
+            order_data,
+            HTTP_IDEMPOTENCY_KEY='order-1',
+        )
+
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(second_response.status_code, 200)
+        self.assertEqual(first_response.json(), second_response.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_same_key_with_other_request_is_rejected(self):
+        self.post(
+            '/api/order/',
+            get_order_data([(self.burger, 1)]),
+            HTTP_IDEMPOTENCY_KEY='order-1',
+        )
+
+        response = self.post(
+            '/api/order/',
+            get_order_data([(self.cola, 1)]),
+            HTTP_IDEMPOTENCY_KEY='order-1',
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_does_not_store_key(self):
+        invalid_order = get_order_data([(self.burger, 1)])
+        invalid_order['products'] = []
+        self.post('/api/order/', invalid_order, HTTP_IDEMPOTENCY_KEY='order-1')
+
+        response = self.post(
+            '/api/order/',
+            get_order_data([(self.burger, 1)]),
+            HTTP_IDEMPOTENCY_KEY='order-1',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        order_data = get_order_data([(self.burger, 1)])
+
+        self.post('/api/order/', order_data)
+        self.post('/api/order/', order_data)
+
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrderTotalTest(OrdersApiTestCase):
+
+    def test_total_is_stored_on_registration(self):
+        response = self.post(
+            '/api/order/',
+            get_order_data([(self.burger, 2), (self.cola, 1)]),
+        )
+
+        self.assertEqual(Decimal(response.json()['total']), Decimal(700))
+        self.assertEqual(Order.objects.get().total, Decimal(700))
+
+    def test_total_follows_order_items(self):
+        self.post('/api/order/', get_order_data([(self.burger, 1)]))
+        order = Order.objects.get()
+
+        cola_item = OrderItem.objects.create(
+            order=order,
+            product=self.cola,
+            price=self.cola.price,
+            quantity=3,
+        )
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal(600))
+
+        cola_item.quantity = 1
+        cola_item.save()
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal(400))
+
+        cola_item.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal(300))
+
+    def test_total_keeps_item_price(self):
+        self.post('/api/order/', get_order_data([(self.burger, 1)]))
+
+        self.burger.price = Decimal(500)
+        self.burger.save()
+
+        self.assertEqual(Order.objects.get().total, Decimal(300))
+
+    def test_recalculate_order_totals_repairs_totals(self):
+        self.post('/api/order/', get_order_data([(self.burger, 2)]))
+        Order.objects.update(total=0)
+
+        call_command('recalculate_order_totals', stdout=StringIO())
+
+        self.assertEqual(Order.objects.get().total, Decimal(600))
+
+
+@override_settings(ORDERS_ARCHIVE_AFTER_DAYS=30)
+class ArchiveOrdersTest(TestCase):
+
+    def setUp(self):
+        self.burger = Product.objects.create(name='Бургер', price=Decimal(300))
+        self.cola = Product.objects.create(name='Кола', price=Decimal(100))
+        old = timezone.now() - timedelta(days=31)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.archivable_orders = [
+                self.create_order(Order.COMPLETED_STATUS, old, quantity)
+                for quantity in range(1, 6)
+            ]
+            self.open_order = self.create_order('1', old, 1)
+            self.recent_order = self.create_order(
+                Order.COMPLETED_STATUS,
+                timezone.now() - timedelta(days=1),
+                1,
+            )
+
+    def create_order(self, status, registered_at, quantity):
+        order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79991234567',
+            address='Москва, Арбат 2',
+            status=status,
+            registered_at=registered_at,
+        )
+        for product, product_quantity in [
+            (self.burger, quantity),
+            (self.cola, 1),
+        ]:
+            OrderItem.objects.create(
+                order=order,
+                product=product,
+                price=product.price,
+                quantity=product_quantity,
+            )
+        order.refresh_from_db()
+        return order
+
+    def test_archive_keeps_orders_in_batches(self):
+        items = {
+            order.id: set(order.items.values_list(
+                'product_id',
+                'price',
+                'quantity',
+            ))
+            for order in self.archivable_orders
+        }
+        stdout = StringIO()
+
+        call_command('archive_orders', batch_size=2, stdout=stdout)
+
+        self.assertIn('Перенесено в архив заказов: 5', stdout.getvalue())
+        self.assertEqual(
+            set(Order.objects.values_list('id', flat=True)),
+            {self.open_order.id, self.recent_order.id},
+        )
+        archived_orders = ArchivedOrder.objects.in_bulk()
+        self.assertEqual(
+            set(archived_orders),
+            {order.id for order in self.archivable_orders},
+        )
+        for order in self.archivable_orders:
+            archived_order = archived_orders[order.id]
+            self.assertEqual(archived_order.total, order.total)
+            self.assertEqual(archived_order.registered_at, order.registered_at)
+            self.assertEqual(
+                set(archived_order.items.values_list(
+                    'product_id',
+                    'price',
+                    'quantity',
+                )),
+                items[order.id],
+            )
+
+    def test_open_and_recent_orders_stay(self):
+        self.assertEqual(archive_orders(Order.objects.none()), 0)
+
+        call_command('archive_orders', days=60, stdout=StringIO())
+
+        self.assertFalse(ArchivedOrder.objects.exists())
+        self.assertEqual(Order.objects.count(), 7)
+        self.assertEqual(OrderItem.objects.count(), 14)
+
+
+class ProductChangesApiTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant = Restaurant.objects.create(
+                name='Star Burger',
+                address='Москва, Тверская 1',
+            )
+            self.burger = Product.objects.create(
+                name='Бургер',
+                price=Decimal(300),
+                image='burger.png',
+            )
+            self.cola = Product.objects.create(
+                name='Кола',
+                price=Decimal(100),
+                image='cola.png',
+            )
+            for product in (self.burger, self.cola):
+                RestaurantMenuItem.objects.create(
+                    restaurant=self.restaurant,
+                    product=product,
+                )
+
+    def get_changes(self, since):
+        return self.client.get('/api/products/changes/', {'since': since})
+
+    def test_zero_version_returns_whole_catalogue(self):
+        response = self.get_changes(0)
+
+        self.assertEqual(response.status_code, 200)
+        changes = response.json()
+        self.assertGreater(changes['version'], 0)
+        self.assertEqual(
+            sorted(product['id'] for product in changes['changed']),
+            [self.burger.id, self.cola.id],
+        )
+        self.assertEqual(changes['removed'], [])
+
+    def test_delta_contains_only_changed_products(self):
+        version = self.get_changes(0).json()['version']
+        cola_id = self.cola.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.burger.price = Decimal(350)
+            self.burger.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cola.delete()
+
+        changes = self.get_changes(version).json()
+
+        self.assertEqual(changes['version'], version + 2)
+        self.assertEqual(
+            [
+                (product['id'], product['price'])
+                for product in changes['changed']
+            ],
+            [(self.burger.id, '350.00')],
+        )
+        self.assertEqual(changes['removed'], [cola_id])
+        self.assertEqual(
+            self.get_changes(changes['version']).json()['changed'],
+            [],
+        )
+
+    def test_uncommitted_changes_get_no_version(self):
+        version = self.get_changes(0).json()['version']
+
+        with self.captureOnCommitCallbacks(execute=False):
+            self.burger.save()
+
+            self.assertEqual(self.get_changes(version).json()['changed'], [])
+        self.assertTrue(
+            CatalogueChange.objects.filter(version__isnull=True).exists()
+        )
+
+    def test_future_version_is_gone(self):
+        version = self.get_changes(0).json()['version']
+
+        response = self.get_changes(version + 1)
+
+        self.assertEqual(response.status_code, 410)
+
+    def test_cleared_history_is_gone(self):
+        version = self.get_changes(0).json()['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.burger.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cola.save()
+        CatalogueChange.objects.filter(version__lte=version + 1).delete()
+
+        self.assertEqual(self.get_changes(version).status_code, 410)
+        self.assertEqual(self.get_changes(version + 1).status_code, 200)
+
+    def test_missing_version_is_bad_request(self):
+        response = self.client.get('/api/products/changes/')
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(DELIVERY_RADIUS=50)
+class RestaurantCandidatesScopeTest(TestCase):
+    locations = {
+        'Москва, Тверская 1': (37.62, 55.75),
+        'Москва, Арбат 2': (37.6, 55.75),
+        'Санкт-Петербург, Невский 1': (30.31, 59.93),
+        'Санкт-Петербург, Невский 2': (30.32, 59.93),
+        'Казань, Баумана 1': (49.12, 55.79),
+    }
+
+    def setUp(self):
+        for address, (lon, lat) in self.locations.items():
+            Location.objects.create(address=address, lon=lon, lat=lat)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant = Restaurant.objects.create(
+                name='Star Burger',
+                address='Москва, Тверская 1',
+            )
+            self.burger = Product.objects.create(
+                name='Бургер',
+                price=Decimal(300),
+                image='burger.png',
+            )
+            RestaurantMenuItem.objects.create(
+                restaurant=self.restaurant,
+                product=self.burger,
+            )
+            self.moscow_order = self.create_order('Москва, Арбат 2')
+            self.spb_order = self.create_order('Санкт-Петербург, Невский 2')
+            self.kazan_order = self.create_order('Казань, Баумана 1')
+            self.completed_order = self.create_order('Москва, Арбат 2')
+            self.completed_order.status = Order.COMPLETED_STATUS
+            self.completed_order.save()
+
+    def create_order(self, address):
+        order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79991234567',
+            address=address,
+        )
+        OrderItem.objects.create(
+            order=order,
+            product=self.burger,
+            price=self.burger.price,
+            quantity=1,
+        )
+        return order
+
+    def get_rescheduled_orders(self):
+        return set(Order.objects.filter(candidates_updated_at__isnull=True))
+
+    def test_moved_restaurant_reschedules_orders_near_both_places(self):
+        with self.captureOnCommitCallbacks():
+            self.restaurant.address = 'Санкт-Петербург, Невский 1'
+            self.restaurant.save()
+
+            self.assertEqual(
+                self.get_rescheduled_orders(),
+                {self.moscow_order, self.spb_order},
+            )
+
+    def test_loaddata_saves_restaurants_and_orders(self):
+        fixture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, fixture_dir)
+        fixture_path = os.path.join(fixture_dir, 'fixture.json')
+        with open(fixture_path, 'w') as fixture_file:
+            call_command(
+                'dumpdata',
+                'foodcartapp.restaurant',
+                'foodcartapp.order',
+                stdout=fixture_file,
+            )
+
+        with self.captureOnCommitCallbacks():
+            call_command('loaddata', fixture_path, verbosity=0)
+
+            self.assertEqual(self.get_rescheduled_orders(), set())
+
+    def test_renamed_restaurant_reschedules_nothing(self):
+        with self.captureOnCommitCallbacks():
+            self.restaurant.name = 'Star Burger Тверская'
+            self.restaurant.save()
+
+            self.assertEqual(self.get_rescheduled_orders(), set())
+
+    def test_deleted_restaurant_reschedules_nearby_orders(self):
+        with self.captureOnCommitCallbacks():
+            self.restaurant.delete()
+
+            self.assertEqual(self.get_rescheduled_orders(), {self.moscow_order})
+
+    def test_menu_change_reschedules_nearby_orders(self):
+        with self.captureOnCommitCallbacks():
+            RestaurantMenuItem.objects.filter(
+                restaurant=self.restaurant,
+            ).get().save()
+
+            self.assertEqual(self.get_rescheduled_orders(), {self.moscow_order})
+
+    def test_geocoded_addresses_reschedule_located_orders(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.create_order('Казань, Кремль 1')
+        self.assertIsNone(order.coordinates)
+        self.assertTrue(
+            GeocodingTask.objects.filter(address=order.address).exists()
+        )
+
+        with self.captureOnCommitCallbacks():
+            addresses_geocoded.send(
+                sender=GeocodingTask,
+                addresses=[order.address],
+                coordinates={'казань, кремль 1': (49.1, 55.8)},
+            )
+
+            self.assertEqual(self.get_rescheduled_orders(), {order})
+
+
+def get_png(color):
+    content = BytesIO()
+    Image.new('RGB', (800, 600), color).save(content, 'PNG')
+    return content.getvalue()
+
+
+class ProductThumbnailsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get_thumbnail_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), default_storage.location)
+            for root, _, names in os.walk(
+                default_storage.path(THUMBNAILS_DIR)
+            )
+            for name in names
+        )
+
+    def test_thumbnails_are_created_after_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name='Бургер',
+                price=Decimal(300),
+                image=SimpleUploadedFile('burger.png', get_png('red')),
+            )
+
+        thumbnails = get_thumbnails(product.image)
+
+        self.assertEqual(list(thumbnails), ['small', 'medium'])
+        self.assertRegex(
+            thumbnails['medium']['webp'],
+            r'/thumbnails/medium/burger\.png\.[0-9a-f]+\.webp$',
+        )
+        self.assertEqual(len(self.get_thumbnail_files()), 4)
+
+    def test_reading_missing_thumbnails_does_not_create_them(self):
+        product = Product.objects.create(
+            name='Бургер',
+            price=Decimal(300),
+            image=SimpleUploadedFile('burger.png', get_png('red')),
+        )
+
+        self.assertEqual(get_thumbnails(product.image), {})
+        self.assertFalse(default_storage.exists(THUMBNAILS_DIR))
+
+    def test_replaced_image_gets_new_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name='Бургер',
+                price=Decimal(300),
+                image=SimpleUploadedFile('burger.png', get_png('red')),
+            )
+        old_thumbnail_files = self.get_thumbnail_files()
+
+        with open(product.image.path, 'wb') as image_file:
+            image_file.write(get_png('green'))
+        modified_at = os.stat(product.image.path).st_mtime + 1
+        os.utime(product.image.path, (modified_at, modified_at))
+        self.assertEqual(get_thumbnails(product.image), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        self.assertTrue(get_thumbnails(product.image))
+        thumbnail_files = self.get_thumbnail_files()
+        self.assertEqual(len(thumbnail_files), 4)
+        self.assertFalse(set(thumbnail_files) & set(old_thumbnail_files))
+
+
+    def test_same_stem_images_keep_own_thumbnails(self):
+        jpeg_content = BytesIO()
+        Image.new('RGB', (800, 600), 'blue').save(jpeg_content, 'JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            png_product = Product.objects.create(
+                name='Бургер',
+                price=Decimal(300),
+                image=SimpleUploadedFile('burger.png', get_png('red')),
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            jpeg_product = Product.objects.create(
+                name='Чизбургер',
+                price=Decimal(350),
+                image=SimpleUploadedFile(
+                    'burger.jpg',
+                    jpeg_content.getvalue(),
+                ),
+            )
+
+        png_thumbnails = get_thumbnails(png_product.image)
+        jpeg_thumbnails = get_thumbnails(jpeg_product.image)
+        self.assertTrue(png_thumbnails)
+        self.assertTrue(jpeg_thumbnails)
+        self.assertNotEqual(png_thumbnails, jpeg_thumbnails)
+        self.assertEqual(len(self.get_thumbnail_files()), 8)
+
+    def test_created_thumbnails_reach_change_feed(self):
+        restaurant = Restaurant.objects.create(
+            name='Star Burger',
+            address='Москва, Тверская 1',
+        )
+        product = Product.objects.create(
+            name='Бургер',
+            price=Decimal(300),
+            image=SimpleUploadedFile('burger.png', get_png('red')),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(
+                restaurant=restaurant,
+                product=product,
+            )
+        changes = self.client.get('/api/products/changes/', {'since': 0})
+        version = changes.json()['version']
+        self.assertEqual(changes.json()['changed'][0]['thumbnails'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('create_product_thumbnails', stdout=StringIO())
+
+        changes = self.client.get(
+            '/api/products/changes/',
+            {'since': version},
+        ).json()
+        changed_product, = changes['changed']
+        self.assertEqual(changed_product['id'], product.id)
+        self.assertEqual(
+            changed_product['thumbnails'],
+            get_thumbnails(product.image),
+        )
+        self.assertTrue(changed_product['thumbnails'])
+
+
+class AcceptedEncodingTest(SimpleTestCase):
+
+    def get_accepted_encoding(self, accept_encoding):
+        request = RequestFactory().get(
+            '/',
+            HTTP_ACCEPT_ENCODING=accept_encoding,
+        )
+        return get_accepted_encoding(request)
+
+    def test_listed_encoding_is_accepted(self):
+        self.assertEqual(self.get_accepted_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(self.get_accepted_encoding('GZIP;q=0.5'), 'gzip')
+
+    def test_zero_quality_forbids_encoding(self):
+        self.assertIsNone(self.get_accepted_encoding('gzip;q=0'))
+        self.assertIsNone(self.get_accepted_encoding('gzip; q=0.0, identity'))
+        self.assertIsNone(self.get_accepted_encoding('*, gzip;q=0'))
+
+    def test_wildcard_accepts_unlisted_encodings(self):
+        self.assertEqual(self.get_accepted_encoding('*;q=0.1'), 'gzip')
+        self.assertIsNone(self.get_accepted_encoding('*;q=0'))
+
+    def test_missing_header_accepts_nothing(self):
+        self.assertIsNone(self.get_accepted_encoding(''))
+        self.assertIsNone(self.get_accepted_encoding('identity'))
+
+
+class PrettyResponseTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DEBUG=True)
+    def test_pretty_response_has_own_etag(self):
+        etag = self.client.get('/api/banners/')['ETag']
+
+        pretty_etag = self.client.get('/api/banners/', {'pretty': ''})['ETag']
+
+        self.assertNotEqual(pretty_etag, etag)
+        self.assertTrue(pretty_etag.endswith('-pretty"'))
+
+    @override_settings(DEBUG=True)
+    def test_pretty_response_is_never_not_modified(self):
+        etag = self.client.get('/api/banners/')['ETag']
+
+        for if_none_match in (etag, f'{etag[:-1]}-pretty"'):
+            response = self.client.get(
+                '/api/banners/',
+                {'pretty': ''},
+                HTTP_IF_NONE_MATCH=if_none_match,
+            )
+
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(
+            self.client.get(
+                '/api/banners/',
+                HTTP_IF_NONE_MATCH=etag,
+            ).status_code,
+            304,
+        )
+
+
+class MenuAvailabilityTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(
+            User.objects.create_user('manager', is_staff=True)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tverskaya = Restaurant.objects.create(
+                name='Star Burger Тверская',
+                address='Москва, Тверская 1',
+            )
+            self.arbat = Restaurant.objects.create(
+                name='Star Burger Арбат',
+                address='Москва, Арбат 2',
+            )
+            self.burger = Product.objects.create(
+                name='Бургер',
+                price=Decimal(300),
+                image='burger.png',
+            )
+            self.cola = Product.objects.create(
+                name='Кола',
+                price=Decimal(100),
+                image='cola.png',
+            )
+            for restaurant, product in [
+                (self.tverskaya, self.burger),
+                (self.arbat, self.burger),
+                (self.tverskaya, self.cola),
+            ]:
+                RestaurantMenuItem.objects.create(
+                    restaurant=restaurant,
+                    product=product,
+                )
+            self.burger_order = Order.objects.create(
+                firstname='Иван',
+                lastname='Петров',
+                phonenumber='+79991234567',
+                address='Москва, Тверская 1',
+            )
+            OrderItem.objects.create(
+                order=self.burger_order,
+                product=self.burger,
+                price=self.burger.price,
+                quantity=1,
+            )
+        CatalogueChange.objects.all().delete()
+
+    def post_changes(self, changes):
+        return self.client.post(
+            '/api/menu/availability/',
+            changes,
+            content_type='application/json',
+        )
+
+    def get_menu(self):
+        return set(
+            RestaurantMenuItem.objects.values_list(
+                'restaurant_id',
+                'product_id',
+                'availability',
+            )
+        )
+
+    def test_chain_stock_out(self):
+        with self.captureOnCommitCallbacks():
+            response = self.post_changes([
+                {'product': self.burger.id, 'availability': False},
+            ])
+
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(
+                Order.objects.get(pk=self.burger_order.pk).candidates_updated_at
+            )
+        self.assertEqual(self.get_menu(), {
+            (self.tverskaya.id, self.burger.id, False),
+            (self.arbat.id, self.burger.id, False),
+            (self.tverskaya.id, self.cola.id, True),
+        })
+
+    def test_upsert_updates_existing_rows(self):
+        menu_item = RestaurantMenuItem.objects.get(
+            restaurant=self.tverskaya,
+            product=self.burger,
+        )
+
+        response = self.post_changes([
+            {
+                'restaurant': self.tverskaya.id,
+                'product': self.burger.id,
+                'availability': False,
+            },
+            {
+                'restaurant': self.arbat.id,
+                'product': self.cola.id,
+                'availability': True,
+            },
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_menu(), {
+            (self.tverskaya.id, self.burger.id, False),
+            (self.arbat.id, self.burger.id, True),
+            (self.tverskaya.id, self.cola.id, True),
+            (self.arbat.id, self.cola.id, True),
+        })
+        self.assertFalse(
+            RestaurantMenuItem.objects.get(pk=menu_item.pk).availability
+        )
+
+    def test_changes_are_recorded_in_feed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_changes([
+                {'product': self.cola.id, 'availability': False},
+                {
+                    'restaurant': self.arbat.id,
+                    'product': self.burger.id,
+                    'availability': False,
+                },
+            ])
+
+        self.assertEqual(
+            set(CatalogueChange.objects.values_list('product_id', flat=True)),
+            {self.burger.id, self.cola.id},
+        )
+        self.assertFalse(
+            CatalogueChange.objects.filter(version__isnull=True).exists()
+        )
+
+    def test_unknown_ids_are_rejected(self):
+        menu = self.get_menu()
+
+        response = self.post_changes([
+            {'product': self.burger.id, 'availability': False},
+            {'product': 0, 'restaurant': 0, 'availability': False},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [
+            {},
+            {
+                'product': ['Недопустимый первичный ключ 0'],
+                'restaurant': ['Недопустимый первичный ключ 0'],
+            },
+        ])
+        self.assertEqual(self.get_menu(), menu)
+        self.assertFalse(CatalogueChange.objects.exists())
+
+    def test_only_staff_can_change_availability(self):
+        self.client.logout()
+
+        response = self.post_changes([
+            {'product': self.burger.id, 'availability': False},
+        ])
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_csv_is_parsed_into_changes(self):
+        content = (
+            f'id,товар,{self.tverskaya.id},{self.arbat.id}\n'
+            f'{self.burger.id},Бургер,0,\n'
+            f'{self.cola.id},Кола, 1 ,0\n'
+        )
+
+        self.assertEqual(parse_availability_csv(content), [
+            {
+                'restaurant': self.tverskaya.id,
+                'product': self.burger.id,
+                'availability': False,
+            },
+            {
+                'restaurant': self.tverskaya.id,
+                'product': self.cola.id,
+                'availability': True,
+            },
+            {
+                'restaurant': self.arbat.id,
+                'product': self.cola.id,
+                'availability': False,
+            },
+        ])
+
+    def test_csv_with_unknown_ids_is_rejected(self):
+        content = (
+            f'id,товар,{self.tverskaya.id},0\n'
+            f'{self.burger.id},Бургер,1,1\n'
+            f'0,Нет такого,1,1\n'
+        )
+
+        with self.assertRaises(ValidationError) as error:
+            parse_availability_csv(content)
+
+        self.assertEqual(
+            error.exception.messages,
+            ['Неизвестные рестораны: 0, товары: 0'],
+        )
+
+    def test_csv_with_bad_cell_is_rejected(self):
+        content = (
+            f'id,товар,{self.tverskaya.id}\n'
+            f'{self.burger.id},Бургер,да\n'
+        )
+
+        with self.assertRaises(ValidationError) as error:
+            parse_availability_csv(content)
+
+        self.assertEqual(
+            error.exception.messages,
+            ['Строка 2: ожидается 1 или 0, получено «да»'],
+        )
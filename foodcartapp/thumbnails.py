@@ -0,0 +1,125 @@
+import os
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+THUMBNAILS_DIR = 'thumbnails'
+THUMBNAIL_SIZES = {
+    'small': (100, 100),
+    'medium': (400, 400),
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+
+def get_fallback_format(image_name):
+    # прозрачность есть только у png, остальное сжимаем в jpeg
+    if image_name.lower().endswith('.png'):
+        return 'PNG'
+    return 'JPEG'
+
+
+def get_image_version(image_name):
+    # картинку могут заменить под тем же именем, тогда превью меняют имя
+    modified_at = default_storage.get_modified_time(image_name)
+    return format(int(modified_at.timestamp() * 1_000_000), 'x')
+
+
+def get_thumbnail_names(image_name, version):
+    # расширение исходника остаётся в имени, чтобы burger.jpg и burger.png
+    # не делили одни превью
+    fallback_format = get_fallback_format(image_name)
+    return {
+        size: {
+            'WEBP': f'{THUMBNAILS_DIR}/{size}/{image_name}.{version}.webp',
+            fallback_format: (
+                f'{THUMBNAILS_DIR}/{size}/{image_name}.{version}.'
+                f'{fallback_format.lower()}'
+            ),
+        }
+        for size in THUMBNAIL_SIZES
+    }
+
+
+def get_last_thumbnail_name(thumbnail_names):
+    return thumbnail_names[list(THUMBNAIL_SIZES)[-1]]['WEBP']
+
+
+def save_thumbnail(image, name, image_format):
+    content = BytesIO()
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+        image.save(content, image_format, quality=JPEG_QUALITY, optimize=True)
+    elif image_format == 'WEBP':
+        image.save(content, image_format, quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(content, image_format, optimize=True)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content.getvalue()))
+
+
+def delete_stale_thumbnails(image_name, thumbnail_names):
+    directory, file_name = os.path.split(image_name)
+    stale_name_re = re.compile(
+        rf'{re.escape(file_name)}\.[0-9a-f]+\.(webp|png|jpeg)'
+    )
+    for size, names in thumbnail_names.items():
+        size_directory = os.path.join(THUMBNAILS_DIR, size, directory)
+        try:
+            _, file_names = default_storage.listdir(size_directory)
+        except (OSError, NotImplementedError):
+            continue
+        for thumbnail_file_name in file_names:
+            name = os.path.join(size_directory, thumbnail_file_name)
+            if stale_name_re.fullmatch(thumbnail_file_name) \
+                    and name not in names.values():
+                default_storage.delete(name)
+
+
+def create_thumbnails(image_name):
+    thumbnail_names = get_thumbnail_names(
+        image_name,
+        get_image_version(image_name),
+    )
+    if default_storage.exists(get_last_thumbnail_name(thumbnail_names)):
+        return False
+
+    with default_storage.open(image_name) as image_file:
+        with Image.open(image_file) as original:
+            original.load()
+
+    for size, names in thumbnail_names.items():
+        thumbnail = original.copy()
+        thumbnail.thumbnail(THUMBNAIL_SIZES[size], Image.Resampling.LANCZOS)
+        # webp сохраняем последним: по нему проверяем, что превью готовы
+        for image_format in sorted(names, key=lambda name: name == 'WEBP'):
+            save_thumbnail(thumbnail, names[image_format], image_format)
+    delete_stale_thumbnails(image_name, thumbnail_names)
+    return True
+
+
+def get_thumbnails(image):
+    # только читает: превью создаются после сохранения товара, а пока их
+    # нет, клиенты показывают исходную картинку
+    if not image:
+        return {}
+    try:
+        thumbnail_names = get_thumbnail_names(
+            image.name,
+            get_image_version(image.name),
+        )
+        if not default_storage.exists(get_last_thumbnail_name(thumbnail_names)):
+            return {}
+    except (OSError, NotImplementedError):
+        return {}
+    return {
+        size: {
+            'src': default_storage.url(names[get_fallback_format(image.name)]),
+            'webp': default_storage.url(names['WEBP']),
+        }
+        for size, names in thumbnail_names.items()
+    }
@@ -1,11 +1,17 @@
 from django.urls import path
 
-from .views import banners_list_api, product_list_api, register_order
+from .views import (banners_list_api, product_changes_api, product_list_api,
+                    register_order, register_orders_bulk,
+                    update_menu_availability)
 
 app_name = "foodcartapp"
 
 urlpatterns = [
     path('products/', product_list_api),
+    path('products/changes/', product_changes_api),
+    path('restaurants/<int:restaurant_id>/menu/', product_list_api),
     path('banners/', banners_list_api),
     path('order/', register_order),
+    path('orders/bulk/', register_orders_bulk),
+    path('menu/availability/', update_menu_availability),
 ]
@@ -1,87 +1,124 @@
+from django.conf import settings
+from django.core.exceptions import BadRequest
 from django.db import transaction
-from django.http import JsonResponse
-from django.templatetags.static import static
-from rest_framework.decorators import api_view
+from django.http import Http404, HttpResponseGone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        Serializer, ValidationError)
+from rest_framework.serializers import (BooleanField, IntegerField,
+                                        ModelSerializer, Serializer,
+                                        ValidationError)
 
-from .models import Order, OrderItem, Product
+from locations.distance_operations import (enqueue_addresses,
+                                           get_cached_coordinates,
+                                           get_coordinates)
 
+from .catalogue import (CatalogueChangesExpired, get_banners,
+                        get_product_changes, get_products_catalogue)
+from .idempotency import idempotent
+from .menu import set_menu_availability
+from .models import (Order, OrderItem, Product, Restaurant,
+                     update_restaurant_candidates)
+from .serialization import compress_response, json_response
 
+
+def get_banners_etag(request):
+    return get_banners()['etag']
+
+
+def get_banners_last_modified(request):
+    return get_banners()['last_modified']
+
+
+@compress_response
+@condition(
+    etag_func=get_banners_etag,
+    last_modified_func=get_banners_last_modified,
+)
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
-
-
-def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
-
-
-def validate(data):
-    errors = []
-    for item in data['products']:
-        key = item['product']
-        if not Product.objects.filter(pk=key).exists():
-            error_message = f'The key {key} does not exist in \'products\''
-            errors.append(error_message)
+    response = json_response(request, content=get_banners()['content'])
+    patch_cache_control(response, no_cache=True)
+    return response
 
-    if errors:
-        raise ValidationError(errors)
+
+def get_requested_catalogue(request, restaurant_id=None):
+    if restaurant_id is None and 'restaurant' in request.GET:
+        try:
+            restaurant_id = int(request.GET['restaurant'])
+        except ValueError:
+            raise BadRequest('Некорректный id ресторана')
+    try:
+        return get_products_catalogue(restaurant_id)
+    except Restaurant.DoesNotExist:
+        raise Http404('Ресторан не найден')
+
+
+def get_catalogue_etag(request, **kwargs):
+    return get_requested_catalogue(request, **kwargs)['etag']
+
+
+def get_catalogue_last_modified(request, **kwargs):
+    return get_requested_catalogue(request, **kwargs)['last_modified']
+
+
+@compress_response
+@condition(
+    etag_func=get_catalogue_etag,
+    last_modified_func=get_catalogue_last_modified,
+)
+def product_list_api(request, restaurant_id=None):
+    response = json_response(
+        request,
+        content=get_requested_catalogue(request, restaurant_id)['content'],
+    )
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def get_requested_changes(request):
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        raise BadRequest('Укажите версию каталога в параметре since')
+    if since < 0:
+        raise BadRequest('Укажите версию каталога в параметре since')
+    try:
+        return get_product_changes(since)
+    except CatalogueChangesExpired:
+        return None
+
+
+def get_changes_etag(request):
+    changes = get_requested_changes(request)
+    return changes and changes['etag']
+
+
+def get_changes_last_modified(request):
+    changes = get_requested_changes(request)
+    return changes and changes['last_modified']
+
+
+@compress_response
+@condition(
+    etag_func=get_changes_etag,
+    last_modified_func=get_changes_last_modified,
+)
+def product_changes_api(request):
+    changes = get_requested_changes(request)
+    if changes is None:
+        # клиенту нужно заново загрузить весь каталог
+        return HttpResponseGone()
+    response = json_response(request, content=changes['content'])
+    patch_cache_control(response, no_cache=True)
+    return response
 
 
 class ProductsSerializer(Serializer):
     product = IntegerField()
     quantity = IntegerField()
 
-    def validate_product(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise ValidationError(f'Недопустимый первичный ключ {value}')
-        return value
-
 
 class OrderSerializer(ModelSerializer):
     products = ProductsSerializer(
@@ -93,35 +130,174 @@ class OrderSerializer(ModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
+        read_only_fields = ['lon', 'lat', 'total']
 
+    def validate_products(self, value):
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.in_bulk(
+                {item['product'] for item in value}
+            )
+        errors = [
+            {'product': [f'Недопустимый первичный ключ {item["product"]}']}
+            if item['product'] not in products else {}
+            for item in value
+        ]
+        if any(errors):
+            raise ValidationError(errors)
 
-@api_view(['POST'])
-@transaction.atomic
-def register_order(request):
+        for item in value:
+            item['product'] = products[item['product']]
+        return value
 
-    serializer = OrderSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
 
-    order = Order.objects.create(
-        firstname=serializer.validated_data['firstname'],
-        lastname=serializer.validated_data['lastname'],
-        phonenumber=serializer.validated_data['phonenumber'],
-        address=serializer.validated_data['address'],
-    )
+class MenuAvailabilitySerializer(Serializer):
+    product = IntegerField()
+    restaurant = IntegerField(required=False, allow_null=True)
+    availability = BooleanField()
 
-    item_fields = serializer.validated_data['products']
+
+def get_raw_product_ids(orders_data):
+    product_ids = set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict):
+            continue
+        items = order_data.get('products')
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                product_ids.add(int(item.get('product')))
+            except (TypeError, ValueError):
+                continue
+    return product_ids
+
+
+def create_orders(orders_fields):
+    coordinates = get_cached_coordinates(
+        order_fields['address'] for order_fields in orders_fields
+    )
+    orders = []
+    for order_fields in orders_fields:
+        order = Order(
+            firstname=order_fields['firstname'],
+            lastname=order_fields['lastname'],
+            phonenumber=order_fields['phonenumber'],
+            address=order_fields['address'],
+        )
+        order.lon, order.lat = (
+            get_coordinates(order.address, coordinates) or (None, None)
+        )
+        order.total = sum(
+            item_fields['product'].price * item_fields['quantity']
+            for item_fields in order_fields['products']
+        )
+        orders.append(order)
+    Order.objects.bulk_create(orders)
 
     order_items = [
         OrderItem(
-            product=Product.objects.get(pk=item_field['product']),
+            product=item_fields['product'],
             order=order,
-            price=Product.objects.get(pk=item_field['product']).price,
-            quantity=item_field['quantity'],
-        ) for item_field in item_fields
+            price=item_fields['product'].price,
+            quantity=item_fields['quantity'],
+        )
+        for order, order_fields in zip(orders, orders_fields)
+        for item_fields in order_fields['products']
     ]
-
     OrderItem.objects.bulk_create(order_items)
 
+    addresses = [order.address for order in orders]
+    transaction.on_commit(lambda: enqueue_addresses(addresses))
+    transaction.on_commit(lambda: update_restaurant_candidates(orders))
+    return orders
+
+
+@api_view(['POST'])
+@idempotent
+@transaction.atomic
+def register_order(request):
+
+    serializer = OrderSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    order, = create_orders([serializer.validated_data])
+
     content = OrderSerializer(order).data
 
     return Response(content)
+
+
+@api_view(['POST'])
+@idempotent
+@transaction.atomic
+def register_orders_bulk(request):
+    orders_data = request.data
+    if not isinstance(orders_data, list) or not orders_data:
+        raise ValidationError('Ожидается непустой список заказов')
+    if len(orders_data) > settings.BULK_ORDERS_MAX_COUNT:
+        raise ValidationError(
+            f'За один запрос можно передать не больше '
+            f'{settings.BULK_ORDERS_MAX_COUNT} заказов'
+        )
+
+    products = Product.objects.in_bulk(get_raw_product_ids(orders_data))
+    results = []
+    valid_indexes = []
+    valid_orders_fields = []
+    for index, order_data in enumerate(orders_data):
+        serializer = OrderSerializer(
+            data=order_data,
+            context={'products': products},
+        )
+        if serializer.is_valid():
+            valid_indexes.append(index)
+            valid_orders_fields.append(serializer.validated_data)
+            results.append(None)
+        else:
+            results.append({'index': index, 'errors': serializer.errors})
+
+    orders = create_orders(valid_orders_fields) if valid_orders_fields else []
+    for index, order in zip(valid_indexes, orders):
+        results[index] = {'index': index, 'id': order.id}
+
+    return Response(results)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def update_menu_availability(request):
+    serializer = MenuAvailabilitySerializer(
+        data=request.data,
+        many=True,
+        allow_empty=False,
+    )
+    serializer.is_valid(raise_exception=True)
+    changes = serializer.validated_data
+
+    product_ids = set(Product.objects.filter(
+        pk__in={change['product'] for change in changes},
+    ).values_list('pk', flat=True))
+    restaurant_ids = set(Restaurant.objects.filter(
+        pk__in={change.get('restaurant') for change in changes},
+    ).values_list('pk', flat=True))
+    errors = []
+    for change in changes:
+        change_errors = {}
+        if change['product'] not in product_ids:
+            change_errors['product'] = [
+                f'Недопустимый первичный ключ {change["product"]}'
+            ]
+        restaurant_id = change.get('restaurant')
+        if restaurant_id is not None and restaurant_id not in restaurant_ids:
+            change_errors['restaurant'] = [
+                f'Недопустимый первичный ключ {restaurant_id}'
+            ]
+        errors.append(change_errors)
+    if any(errors):
+        raise ValidationError(errors)
+
+    set_menu_availability(changes)
+    return Response(serializer.data)
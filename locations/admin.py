@@ -1,8 +1,16 @@
 from django.contrib import admin
 
-from locations.models import Location
+from locations.models import GeocodingTask, Location
 
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(GeocodingTask)
+class GeocodingTaskAdmin(admin.ModelAdmin):
+    list_display = [
+        'address',
+        'created_at',
+    ]
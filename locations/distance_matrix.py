@@ -0,0 +1,85 @@
+import numpy as np
+from geopy import distance
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def to_points(points):
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def get_haversine_distances(origins, destinations):
+    lon1, lat1 = np.radians(origins[..., 0]), np.radians(origins[..., 1])
+    lon2, lat2 = np.radians(destinations[..., 0]), np.radians(destinations[..., 1])
+
+    haversine = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
+
+def get_geodesic_distances(origins, destinations):
+    return np.array([
+        distance.distance((lat1, lon1), (lat2, lon2)).km
+        for (lon1, lat1), (lon2, lat2) in zip(origins, destinations)
+    ], dtype=float)
+
+
+def get_haversine_matrix(origins, destinations):
+    origins = to_points(origins)
+    destinations = to_points(destinations)
+    return get_haversine_distances(
+        origins[:, np.newaxis],
+        destinations[np.newaxis, :],
+    )
+
+
+def get_geodesic_matrix(origins, destinations):
+    origins = to_points(origins)
+    destinations = to_points(destinations)
+    rows, columns = np.indices((len(origins), len(destinations)))
+    return get_geodesic_distances(
+        origins[rows.ravel()],
+        destinations[columns.ravel()],
+    ).reshape(len(origins), len(destinations))
+
+
+def get_distance_matrix(origins, destinations, accurate=False):
+    if accurate:
+        return get_geodesic_matrix(origins, destinations)
+    return get_haversine_matrix(origins, destinations)
+
+
+def get_bounding_box(lon, lat, radius):
+    lat_delta = radius / KM_PER_DEGREE
+    lon_delta = radius / (KM_PER_DEGREE * max(np.cos(np.radians(lat)), 1e-6))
+    return lon - lon_delta, lon + lon_delta, lat - lat_delta, lat + lat_delta
+
+
+def get_bounding_box_mask(origins, destinations, radius):
+    lat_delta = radius / KM_PER_DEGREE
+    cos_lat = np.maximum(np.cos(np.radians(origins[:, 1])), 1e-6)
+    lon_delta = (radius / (KM_PER_DEGREE * cos_lat))[:, np.newaxis]
+
+    lon_diff = np.abs(destinations[np.newaxis, :, 0] - origins[:, 0, np.newaxis])
+    lon_diff = np.minimum(lon_diff, 360 - lon_diff)
+    lat_diff = np.abs(destinations[np.newaxis, :, 1] - origins[:, 1, np.newaxis])
+    return (lat_diff <= lat_delta) & (lon_diff <= lon_delta)
+
+
+def get_distances_within_radius(origins, destinations, radius, accurate=False):
+    origins = to_points(origins)
+    destinations = to_points(destinations)
+
+    # расстояния считаем только для пар внутри ограничивающего прямоугольника
+    mask = get_bounding_box_mask(origins, destinations, radius)
+    rows, columns = np.nonzero(mask)
+    if accurate:
+        distances = get_geodesic_distances(origins[rows], destinations[columns])
+    else:
+        distances = get_haversine_distances(origins[rows], destinations[columns])
+
+    within_radius = distances <= radius
+    return rows[within_radius], columns[within_radius], distances[within_radius]
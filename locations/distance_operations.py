@@ -1,44 +1,124 @@
-import requests
 from django.conf import settings
-from geopy import distance
+from django.utils import timezone
 
-from locations.models import Location
+from locations.geocoder import fetch_many_coordinates
+from locations.models import GeocodingTask, Location, normalize_address
+from locations.signals import addresses_geocoded
 
 
-def measure_distance(coordinates1, coordinates2):
-    lon1, lat1 = coordinates1
-    lon2, lat2 = coordinates2
-    return distance.distance((lat1, lon1), (lat2, lon2)).km
+def is_location_expired(lon, lat, geocoder_req_date):
+    if lon is None or lat is None:
+        ttl = settings.GEOCODER_NEGATIVE_CACHE_TTL
+    else:
+        ttl = settings.GEOCODER_CACHE_TTL
+    return geocoder_req_date < timezone.now() - ttl
 
 
-def get_coordinates(address, locations):
-    for location in locations:
-        if location.address == address:
-            return location.lon, location.lat
+def read_locations(addresses):
+    locations = Location.objects.filter(
+        address__in={normalize_address(address) for address in addresses},
+    ).values_list('address', 'lon', 'lat', 'geocoder_req_date')
+    coordinates = {}
+    expired_addresses = set()
+    for address_key, lon, lat, geocoder_req_date in locations:
+        if lon is None or lat is None:
+            coordinates[address_key] = None
+        else:
+            coordinates[address_key] = (lon, lat)
+        if is_location_expired(lon, lat, geocoder_req_date):
+            expired_addresses.add(address_key)
+    return coordinates, expired_addresses
 
-    apikey = settings.YANDEX_KEY
-    response = requests.get(
-        "https://geocode-maps.yandex.ru/1.x",
-        params={
-            "geocode": address,
-            "apikey": apikey,
-            "format": "json",
-        }
+
+def get_cached_coordinates(addresses):
+    coordinates, _ = read_locations(addresses)
+    return coordinates
+
+
+def get_locations_coordinates(addresses):
+    addresses = set(addresses)
+    coordinates, expired_addresses = read_locations(addresses)
+
+    missing_addresses = {}
+    for address in addresses:
+        address_key = normalize_address(address)
+        if address_key not in coordinates or address_key in expired_addresses:
+            missing_addresses.setdefault(address_key, address)
+
+    geocoded = fetch_many_coordinates(missing_addresses.values())
+    geocoder_req_date = timezone.now()
+    locations = []
+    for address, address_coordinates in geocoded.items():
+        address_key = normalize_address(address)
+        coordinates[address_key] = address_coordinates
+        lon, lat = address_coordinates or (None, None)
+        locations.append(
+            Location(
+                address=address_key,
+                lon=lon,
+                lat=lat,
+                geocoder_req_date=geocoder_req_date,
+            )
+        )
+    Location.objects.bulk_create(
+        locations,
+        update_conflicts=True,
+        unique_fields=['address'],
+        update_fields=['lon', 'lat', 'geocoder_req_date'],
+    )
+
+    return coordinates
+
+
+def enqueue_addresses(addresses, relocate=False):
+    # relocate ставит в очередь и найденные в кэше адреса, чтобы воркер
+    # разослал их координаты тем, кто их ещё не получил
+    addresses = set(addresses)
+    locations = Location.objects.filter(
+        address__in={normalize_address(address) for address in addresses},
+    ).values_list('address', 'lon', 'lat', 'geocoder_req_date')
+    known_address_keys = {
+        address_key for address_key, lon, lat, geocoder_req_date in locations
+        if not is_location_expired(lon, lat, geocoder_req_date)
+        and not (relocate and lon is not None and lat is not None)
+    }
+    GeocodingTask.objects.bulk_create(
+        [
+            GeocodingTask(address=address)
+            for address in addresses
+            if normalize_address(address) not in known_address_keys
+        ],
+        ignore_conflicts=True,
     )
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection'][
-        'featureMember'
-    ]
 
-    if not found_places:
-        return None
 
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+def process_geocoding_tasks(batch_size):
+    tasks = list(GeocodingTask.objects.order_by('created_at')[:batch_size])
+    if not tasks:
+        return 0
 
-    Location.objects.create(
-        address=address,
-        lon=lon,
-        lat=lat,
+    coordinates = get_locations_coordinates(task.address for task in tasks)
+    processed_tasks = []
+    failed_tasks = []
+    for task in tasks:
+        if normalize_address(task.address) in coordinates:
+            processed_tasks.append(task)
+        else:
+            failed_tasks.append(task)
+    GeocodingTask.objects.filter(
+        id__in=[task.id for task in processed_tasks]
+    ).delete()
+    GeocodingTask.objects.filter(
+        id__in=[task.id for task in failed_tasks]
+    ).update(created_at=timezone.now())
+
+    addresses_geocoded.send(
+        sender=GeocodingTask,
+        addresses=[task.address for task in processed_tasks],
+        coordinates=coordinates,
     )
-    return lon, lat
+    return len(processed_tasks)
+
+
+def get_coordinates(address, coordinates):
+    return coordinates.get(normalize_address(address))
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+
+
+def fetch_coordinates(address):
+    response = requests.get(
+        settings.GEOCODER_URL,
+        params={
+            "geocode": address,
+            "apikey": settings.YANDEX_KEY,
+            "format": "json",
+        },
+        timeout=settings.GEOCODER_TIMEOUT,
+    )
+    response.raise_for_status()
+    found_places = response.json()['response']['GeoObjectCollection'][
+        'featureMember'
+    ]
+
+    if not found_places:
+        return None
+
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+    return float(lon), float(lat)
+
+
+def try_fetch_coordinates(address):
+    try:
+        return True, fetch_coordinates(address)
+    except (requests.RequestException, KeyError, ValueError):
+        return False, None
+
+
+def fetch_many_coordinates(addresses):
+    # None в ответе — адрес не найден, адреса с ошибкой запроса пропускаются
+    addresses = list(addresses)
+    if not addresses:
+        return {}
+
+    max_workers = min(settings.GEOCODER_CONCURRENCY, len(addresses))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(try_fetch_coordinates, addresses)
+
+    return {
+        address: coordinates
+        for address, (is_fetched, coordinates) in zip(addresses, results)
+        if is_fetched
+    }
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from locations.distance_operations import process_geocoding_tasks
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса из очереди и сохраняет их координаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Сколько адресов брать из очереди за один раз',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь один раз и выйти',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_geocoding_tasks(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Обработано адресов: {processed}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0004_auto_20220829_0951'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodingTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=200, unique=True, verbose_name='Адрес')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата постановки в очередь')),
+            ],
+            options={
+                'verbose_name': 'адрес в очереди геокодера',
+                'verbose_name_plural': 'очередь геокодера',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.1 on 2026-10-18 23:05
+
+from django.db import migrations
+
+
+def normalize_addresses(apps, schema_editor):
+    Location = apps.get_model('locations', 'Location')
+    normalized_locations = {}
+    duplicate_ids = []
+    for location in Location.objects.order_by('-geocoder_req_date').iterator():
+        address_key = ' '.join(location.address.lower().split())
+        if address_key in normalized_locations:
+            # оставляем самый свежий ответ геокодера
+            duplicate_ids.append(location.id)
+            continue
+        location.address = address_key
+        normalized_locations[address_key] = location
+    Location.objects.filter(id__in=duplicate_ids).delete()
+    Location.objects.bulk_update(
+        normalized_locations.values(),
+        ['address'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0005_geocodingtask'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_addresses, migrations.RunPython.noop),
+    ]
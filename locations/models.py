@@ -2,7 +2,13 @@ from django.db import models
 from django.utils import timezone
 
 
+def normalize_address(address):
+    return ' '.join(address.lower().split())
+
+
 class Location(models.Model):
+    # адрес хранится нормализованным, чтобы разные написания находили
+    # одну запись
 
     address = models.CharField(
         'Адрес',
@@ -31,3 +37,28 @@ class Location(models.Model):
 
     def __str__(self):
         return self.address
+
+    def save(self, *args, **kwargs):
+        self.address = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+
+class GeocodingTask(models.Model):
+
+    address = models.CharField(
+        'Адрес',
+        max_length=200,
+        unique=True,
+    )
+    created_at = models.DateTimeField(
+        'Дата постановки в очередь',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'адрес в очереди геокодера'
+        verbose_name_plural = 'очередь геокодера'
+
+    def __str__(self):
+        return self.address
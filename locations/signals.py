@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Отправляется обработчиком очереди с аргументами addresses и coordinates
+addresses_geocoded = Signal()
@@ -0,0 +1,137 @@
+import math
+from collections import defaultdict
+from operator import itemgetter
+
+from locations.distance_matrix import (KM_PER_DEGREE,
+                                       get_distances_within_radius,
+                                       get_haversine_matrix)
+
+
+class GridIndex:
+
+    def __init__(self, cell_size=0.05):
+        self.cell_size = cell_size
+        self.cells = defaultdict(dict)
+        self.points = {}
+        self.bounds = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def get_cell(self, lon, lat):
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def add(self, key, lon, lat):
+        self.remove(key)
+        self.points[key] = (lon, lat)
+        cell = self.get_cell(lon, lat)
+        self.cells[cell][key] = (lon, lat)
+        self.extend_bounds(cell)
+
+    def remove(self, key):
+        point = self.points.pop(key, None)
+        if point is None:
+            return
+        cell = self.get_cell(*point)
+        del self.cells[cell][key]
+        if not self.cells[cell]:
+            del self.cells[cell]
+            self.shrink_bounds(cell)
+
+    def extend_bounds(self, cell):
+        x, y = cell
+        if self.bounds is None:
+            self.bounds = (x, x, y, y)
+            return
+        min_x, max_x, min_y, max_y = self.bounds
+        self.bounds = (
+            min(min_x, x),
+            max(max_x, x),
+            min(min_y, y),
+            max(max_y, y),
+        )
+
+    def shrink_bounds(self, cell):
+        x, y = cell
+        min_x, max_x, min_y, max_y = self.bounds
+        if min_x < x < max_x and min_y < y < max_y:
+            return
+        # границы сдвигаются, только когда опустела крайняя ячейка
+        self.bounds = None
+        for remaining_cell in self.cells:
+            self.extend_bounds(remaining_cell)
+
+    def sync(self, points):
+        for key in self.points.keys() - points.keys():
+            self.remove(key)
+        for key, point in points.items():
+            if self.points.get(key) != point:
+                self.add(key, *point)
+
+    def iter_ring_cells(self, cell, ring):
+        x, y = cell
+        if not ring:
+            yield cell
+            return
+        for dx in range(-ring, ring + 1):
+            yield x + dx, y - ring
+            yield x + dx, y + ring
+        for dy in range(-ring + 1, ring):
+            yield x - ring, y + dy
+            yield x + ring, y + dy
+
+    def get_min_distance_outside(self, lat, ring):
+        # Точки за пределами колец 0..ring отстоят от центра хотя бы на ring ячеек
+        band_lat = min(abs(lat) + (ring + 1) * self.cell_size, 89.9)
+        return (
+            ring * self.cell_size * KM_PER_DEGREE
+            * math.cos(math.radians(band_lat))
+        )
+
+    def nearest(self, lon, lat, k=None, radius=None, predicate=None):
+        if not self.cells:
+            return []
+
+        origin_cell = self.get_cell(lon, lat)
+        min_x, max_x, min_y, max_y = self.bounds
+        max_ring = max(
+            origin_cell[0] - min_x,
+            max_x - origin_cell[0],
+            origin_cell[1] - min_y,
+            max_y - origin_cell[1],
+            0,
+        )
+        origin = (lon, lat)
+        found = []
+        for ring in range(max_ring + 1):
+            keys = []
+            points = []
+            for cell in self.iter_ring_cells(origin_cell, ring):
+                for key, point in self.cells.get(cell, {}).items():
+                    if predicate is None or predicate(key):
+                        keys.append(key)
+                        points.append(point)
+            if keys:
+                if radius is None:
+                    distances = get_haversine_matrix(origin, points)[0]
+                    columns = range(len(keys))
+                else:
+                    _, columns, distances = get_distances_within_radius(
+                        origin,
+                        points,
+                        radius,
+                    )
+                found.extend(
+                    (keys[column], distance)
+                    for column, distance in zip(columns, distances.tolist())
+                )
+                found.sort(key=itemgetter(1))
+
+            min_distance_outside = self.get_min_distance_outside(lat, ring)
+            if radius is not None and min_distance_outside > radius:
+                break
+            if k is not None and len(found) >= k \
+                    and found[k - 1][1] <= min_distance_outside:
+                break
+
+        return found[:k]
@@ -1,3 +1,248 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from locations.distance_operations import (enqueue_addresses,
+                                           get_cached_coordinates,
+                                           get_locations_coordinates)
+from locations.distance_matrix import (get_distance_matrix,
+                                       get_distances_within_radius)
+from locations.geocoder import fetch_many_coordinates
+from locations.models import GeocodingTask, Location
+from locations.spatial_index import GridIndex
+
+
+class FakeGeocoderHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        address = parse_qs(urlparse(self.path).query)['geocode'][0]
+        with server.lock:
+            server.requested_addresses.append(address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.slow_delay if 'slow' in address else server.delay)
+            if 'nowhere' in address:
+                members = []
+            else:
+                members = [
+                    {'GeoObject': {'Point': {'pos': '37.6 55.7'}}},
+                ]
+            body = json.dumps({
+                'response': {'GeoObjectCollection': {'featureMember': members}},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGeocoderTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGeocoderHandler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address
+        cls.settings_override = override_settings(
+            GEOCODER_URL=f'http://{host}:{port}/',
+            GEOCODER_TIMEOUT=1,
+            GEOCODER_CONCURRENCY=2,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requested_addresses = []
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.delay = 0
+        self.server.slow_delay = 0
+
+
+class FetchManyCoordinatesTest(FakeGeocoderTestCase):
+
+    def test_concurrency_is_limited(self):
+        self.server.delay = 0.1
+        addresses = [f'Москва, ул. Тверская, {number}' for number in range(6)]
+
+        coordinates = fetch_many_coordinates(addresses)
+
+        self.assertEqual(
+            coordinates,
+            {address: (37.6, 55.7) for address in addresses},
+        )
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_not_found_address_is_none(self):
+        coordinates = fetch_many_coordinates(['nowhere street'])
+
+        self.assertEqual(coordinates, {'nowhere street': None})
+
+    @override_settings(GEOCODER_TIMEOUT=0.2)
+    def test_timed_out_address_is_skipped(self):
+        self.server.slow_delay = 1
+
+        coordinates = fetch_many_coordinates(['slow street', 'fast street'])
+
+        self.assertEqual(coordinates, {'fast street': (37.6, 55.7)})
+
+
+class LocationsCacheTest(FakeGeocoderTestCase):
+
+    def test_geocoded_addresses_are_upserted(self):
+        coordinates = get_locations_coordinates([
+            'Москва,  Тверская 1',
+            'nowhere street',
+        ])
+
+        self.assertEqual(coordinates, {
+            'москва, тверская 1': (37.6, 55.7),
+            'nowhere street': None,
+        })
+        self.assertQuerysetEqual(
+            Location.objects.order_by('address').values_list(
+                'address', 'lon', 'lat'
+            ),
+            [
+                ('nowhere street', None, None),
+                ('москва, тверская 1', 37.6, 55.7),
+            ],
+            transform=tuple,
+        )
+
+    def test_cached_addresses_are_not_geocoded_again(self):
+        get_locations_coordinates(['Москва, Тверская 1'])
+        self.server.requested_addresses = []
+
+        coordinates = get_locations_coordinates(['москва,   ТВЕРСКАЯ 1'])
+
+        self.assertEqual(coordinates, {'москва, тверская 1': (37.6, 55.7)})
+        self.assertEqual(self.server.requested_addresses, [])
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_expired_addresses_are_refreshed(self):
+        Location.objects.create(
+            address='москва, тверская 1',
+            lon=1,
+            lat=1,
+            geocoder_req_date=timezone.now() - timedelta(days=365),
+        )
+
+        coordinates = get_locations_coordinates(['Москва, Тверская 1'])
+
+        self.assertEqual(coordinates, {'москва, тверская 1': (37.6, 55.7)})
+        self.assertEqual(self.server.requested_addresses, ['Москва, Тверская 1'])
+        location = Location.objects.get()
+        self.assertEqual((location.lon, location.lat), (37.6, 55.7))
+
+    def test_cached_coordinates_never_call_geocoder(self):
+        coordinates = get_cached_coordinates(['Москва, Тверская 1'])
+
+        self.assertEqual(coordinates, {})
+        self.assertEqual(self.server.requested_addresses, [])
+
+    def test_only_unknown_addresses_are_enqueued(self):
+        Location.objects.create(address='москва, тверская 1', lon=1, lat=1)
+
+        enqueue_addresses(['Москва, Тверская 1', 'Москва, Арбат 2'])
+
+        self.assertQuerysetEqual(
+            GeocodingTask.objects.values_list('address', flat=True),
+            ['Москва, Арбат 2'],
+        )
+
+
+class GridIndexTest(SimpleTestCase):
+    points = {
+        'center': (37.62, 55.75),
+        'near': (37.66, 55.76),
+        'suburb': (37.9, 55.9),
+        'far': (39.7, 54.6),
+    }
+
+    def setUp(self):
+        self.index = GridIndex()
+        self.index.sync(self.points)
+
+    def get_brute_force_nearest(self, lon, lat, radius):
+        keys = list(self.index.points)
+        _, columns, distances = get_distances_within_radius(
+            [(lon, lat)],
+            [self.index.points[key] for key in keys],
+            radius,
+        )
+        return sorted(
+            (keys[column], distance)
+            for column, distance in zip(columns, distances.tolist())
+        )
+
+    def test_nearest_matches_distance_matrix(self):
+        keys = list(self.points)
+        distances = get_distance_matrix(
+            [(37.6, 55.7)],
+            [self.points[key] for key in keys],
+        )[0]
+
+        nearest = self.index.nearest(37.6, 55.7)
+
+        self.assertEqual([key for key, _ in nearest], keys)
+        for (_, distance), expected in zip(nearest, distances):
+            self.assertAlmostEqual(distance, expected)
+
+    def test_nearest_within_radius(self):
+        nearest = self.index.nearest(37.6, 55.7, k=2, radius=30)
+
+        self.assertEqual([key for key, _ in nearest], ['center', 'near'])
+        self.assertEqual(
+            sorted(self.index.nearest(37.6, 55.7, radius=30)),
+            self.get_brute_force_nearest(37.6, 55.7, 30),
+        )
+
+    def test_bounds_follow_removed_points(self):
+        self.index.remove('far')
+        self.index.add('near', 37.61, 55.74)
+
+        self.assertEqual(
+            self.index.bounds,
+            (
+                self.index.get_cell(37.61, 55.74)[0],
+                self.index.get_cell(37.9, 55.9)[0],
+                self.index.get_cell(37.61, 55.74)[1],
+                self.index.get_cell(37.9, 55.9)[1],
+            ),
+        )
+        self.assertEqual(
+            sorted(self.index.nearest(37.6, 55.7, radius=100)),
+            self.get_brute_force_nearest(37.6, 55.7, 100),
+        )
+
+        self.index.sync({})
+
+        self.assertIsNone(self.index.bounds)
+        self.assertEqual(self.index.nearest(37.6, 55.7), [])
@@ -1,3 +1,160 @@
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import quote
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.utils import timezone
+
+from foodcartapp.models import (CatalogueChange, Order, OrderItem,
+                                OrderRestaurantCandidate, Product, Restaurant,
+                                RestaurantMenuItem)
+from locations.models import GeocodingTask
+
+
+class OrdersChangesTest(TestCase):
+
+    def setUp(self):
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant = Restaurant.objects.create(
+                name='Star Burger',
+                address='Москва, Тверская 1',
+                lon=37.62,
+                lat=55.75,
+            )
+            burger = Product.objects.create(name='Бургер', price=Decimal(300))
+            self.order = Order.objects.create(
+                firstname='Иван',
+                lastname='Петров',
+                phonenumber='+79991234567',
+                address='Москва, Арбат 2',
+            )
+            OrderItem.objects.create(
+                order=self.order,
+                product=burger,
+                price=burger.price,
+                quantity=1,
+            )
+        Order.objects.filter(pk=self.order.pk).update(lon=37.6, lat=55.75)
+        OrderRestaurantCandidate.objects.create(
+            order=self.order,
+            restaurant=self.restaurant,
+            distance=1.2,
+        )
+        GeocodingTask.objects.all().delete()
+        self.order.refresh_from_db()
+
+    def get_changes(self, since, **params):
+        return self.client.get(
+            '/manager/orders/changes/',
+            {'since': since.isoformat(), **params},
+        )
+
+    def test_changes_contain_rendered_rows(self):
+        since = self.order.updated_at - timedelta(seconds=1)
+
+        response = self.get_changes(since, status='1')
+
+        self.assertEqual(response.status_code, 200)
+        changes = response.json()
+        self.assertEqual(changes['since'], self.order.updated_at.isoformat())
+        order_event, = changes['orders']
+        self.assertEqual(order_event['id'], self.order.id)
+        self.assertTrue(order_event['visible'])
+        self.assertIn('Star Burger - 1,2', order_event['html'])
+        self.assertIn(
+            '?next=' + quote('/manager/orders/?status=1'),
+            order_event['html'],
+        )
+
+    def test_nothing_changed_returns_empty_list(self):
+        since = timezone.now() + timedelta(minutes=1)
+
+        changes = self.get_changes(since).json()
+
+        self.assertEqual(changes, {'since': since.isoformat(), 'orders': []})
+
+    def test_hidden_orders_have_no_html(self):
+        since = self.order.updated_at - timedelta(seconds=1)
+
+        order_event, = self.get_changes(since, status='2').json()['orders']
+
+        self.assertFalse(order_event['visible'])
+        self.assertNotIn('html', order_event)
+
+    def test_changes_do_not_write(self):
+        since = self.order.updated_at - timedelta(seconds=1)
+        Order.objects.filter(pk=self.order.pk).update(lon=None, lat=None)
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(lat=None)
+        updated_at = Order.objects.get(pk=self.order.pk).updated_at
+
+        self.get_changes(since)
+
+        self.assertEqual(
+            Order.objects.get(pk=self.order.pk).updated_at,
+            updated_at,
+        )
+        self.assertFalse(GeocodingTask.objects.exists())
+
+    def test_board_links_keep_full_path(self):
+        response = self.client.get('/manager/orders/', {'status': '1'})
+
+        self.assertContains(
+            response,
+            '?next=' + quote('/manager/orders/?status=1'),
+        )
+
+
+class MenuAvailabilityUploadTest(TestCase):
+
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_user('manager', is_staff=True)
+        )
+        self.restaurant = Restaurant.objects.create(
+            name='Star Burger',
+            address='Москва, Тверская 1',
+        )
+        self.burger = Product.objects.create(
+            name='Бургер',
+            price=Decimal(300),
+            image='burger.png',
+        )
+        self.menu_item = RestaurantMenuItem.objects.create(
+            restaurant=self.restaurant,
+            product=self.burger,
+        )
+        CatalogueChange.objects.all().delete()
+
+    def upload(self, content):
+        return self.client.post(
+            '/manager/products/availability/upload/',
+            {'file': SimpleUploadedFile('menu.csv', content.encode())},
+            follow=True,
+        )
+
+    def test_upload_updates_menu(self):
+        response = self.upload(
+            f'id,товар,{self.restaurant.id}\n{self.burger.id},Бургер,0\n'
+        )
+
+        self.assertContains(response, 'Обновлено позиций меню: 1')
+        self.menu_item.refresh_from_db()
+        self.assertFalse(self.menu_item.availability)
+        self.assertEqual(
+            list(CatalogueChange.objects.values_list('product_id', flat=True)),
+            [self.burger.id],
+        )
+
+    def test_invalid_upload_changes_nothing(self):
+        response = self.upload(
+            f'id,товар,{self.restaurant.id}\n{self.burger.id},Бургер,нет\n'
+        )
 
-# Create your tests here.
+        self.assertContains(response, 'ожидается 1 или 0')
+        self.menu_item.refresh_from_db()
+        self.assertTrue(self.menu_item.availability)
+        self.assertFalse(CatalogueChange.objects.exists())
@@ -9,11 +9,31 @@ urlpatterns = [
     path('', lambda request: redirect('restaurateur:ProductsView')),
 
     path('products/', views.view_products, name="ProductsView"),
+    path(
+        'products/availability/',
+        views.update_product_availability,
+        name="update_product_availability",
+    ),
+    path(
+        'products/availability/upload/',
+        views.upload_menu_availability,
+        name="upload_menu_availability",
+    ),
+    path(
+        'products/availability.csv',
+        views.download_menu_availability,
+        name="download_menu_availability",
+    ),
 
     path('restaurants/', views.view_restaurants, name="RestaurantView"),
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path(
+        'orders/changes/',
+        views.view_orders_changes,
+        name="view_orders_changes",
+    ),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
@@ -1,12 +1,30 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.core import signing
+from django.http import HttpResponse
 from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.views import View
+from django.views.decorators.http import require_POST
+
+from foodcartapp.catalogue import get_availability_matrix
+from foodcartapp.menu import (dump_availability_csv, parse_availability_csv,
+                              set_menu_availability)
+from foodcartapp.models import (Order, Product, Restaurant,
+                                find_closest_restaurants,
+                                prefetch_restaurant_candidates)
+from foodcartapp.serialization import json_response
 
-from foodcartapp.models import Order, Product, Restaurant
+ORDERS_CHANGES_OVERLAP = timedelta(seconds=5)
 
 
 class Login(forms.Form):
@@ -26,6 +44,101 @@ class Login(forms.Form):
     )
 
 
+class OrdersFilter(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус',
+        required=False,
+        choices=[
+            ('', 'Все незавершённые'),
+            *[
+                (status, name) for status, name in Order.STATUS_CHOICES
+                if status != Order.COMPLETED_STATUS
+            ],
+        ],
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    registered_from = forms.DateField(
+        label='Зарегистрирован с',
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    registered_to = forms.DateField(
+        label='по',
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    cursor = forms.CharField(
+        required=False,
+        widget=forms.HiddenInput,
+    )
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            status, registered_at, order_id = signing.loads(cursor)
+        except (signing.BadSignature, ValueError):
+            raise forms.ValidationError('Некорректная ссылка на страницу')
+        return status, datetime.fromisoformat(registered_at), order_id
+
+
+class ProductAvailabilityForm(forms.Form):
+    product = forms.ModelChoiceField(queryset=Product.objects.all())
+    availability = forms.BooleanField(required=False)
+
+
+class MenuAvailabilityUploadForm(forms.Form):
+    file = forms.FileField(label='CSV с наличием товаров')
+
+    def clean_file(self):
+        try:
+            content = self.cleaned_data['file'].read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise forms.ValidationError('Файл должен быть в кодировке UTF-8')
+        return parse_availability_csv(content)
+
+
+def get_orders_filter(data):
+    filter_form = OrdersFilter(data)
+    if not filter_form.is_valid():
+        filter_form = OrdersFilter({})
+        filter_form.is_valid()
+    return filter_form
+
+
+def filter_board_orders(orders, filters):
+    if filters['status']:
+        orders = orders.filter(status=filters['status'])
+    if filters['registered_from']:
+        orders = orders.filter(
+            registered_at__gte=get_start_of_day(filters['registered_from'])
+        )
+    if filters['registered_to']:
+        orders = orders.filter(
+            registered_at__lt=get_start_of_day(
+                filters['registered_to'] + timedelta(days=1)
+            )
+        )
+    return orders
+
+
+def get_board_key(order):
+    # строки сравниваются в том же порядке, что и ordered_for_board
+    registered_at = timezone.localtime(order.registered_at)
+    return f'{order.status}|{registered_at:%Y%m%d%H%M%S%f}|{order.id:012d}'
+
+
+def get_start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def dump_orders_cursor(order):
+    return signing.dumps(
+        [order.status, order.registered_at.isoformat(), order.id]
+    )
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -63,29 +176,75 @@ def is_manager(user):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    default_availability = {restaurant.id: False for restaurant in restaurants}
-    products_with_restaurants = []
-    for product in products:
-
-        availability = {
-            **default_availability,
-            **{item.restaurant_id: item.availability for item in product.menu_items.all()},
-        }
-        orderer_availability = [availability[restaurant.id] for restaurant in restaurants]
+    availability = get_availability_matrix()
+    restaurant_ids = availability['restaurant_ids']
+    restaurants = Restaurant.objects.in_bulk(restaurant_ids)
+    products = Product.objects.select_related('category').in_bulk(
+        availability['product_ids']
+    )
 
-        products_with_restaurants.append(
-            (product, orderer_availability)
+    width = len(restaurant_ids)
+    products_with_restaurants = [
+        (
+            products[product_id],
+            availability['matrix'][row * width:(row + 1) * width],
         )
+        for row, product_id in enumerate(availability['product_ids'])
+        if product_id in products
+    ]
 
     return render(request, template_name="products_list.html", context={
+        'upload_form': MenuAvailabilityUploadForm(),
         'products_with_restaurants': products_with_restaurants,
-        'restaurants': restaurants,
+        'restaurants': [
+            restaurants.get(restaurant_id) for restaurant_id in restaurant_ids
+        ],
     })
 
 
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def update_product_availability(request):
+    form = ProductAvailabilityForm(request.POST)
+    if form.is_valid():
+        product = form.cleaned_data['product']
+        set_menu_availability([{
+            'product': product.id,
+            'availability': form.cleaned_data['availability'],
+        }])
+        messages.success(
+            request,
+            f'Наличие товара «{product.name}» обновлено во всех ресторанах',
+        )
+    else:
+        messages.error(request, 'Не удалось обновить наличие товара')
+    return redirect('restaurateur:ProductsView')
+
+
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def upload_menu_availability(request):
+    form = MenuAvailabilityUploadForm(request.POST, request.FILES)
+    if form.is_valid():
+        changes = form.cleaned_data['file']
+        set_menu_availability(changes)
+        messages.success(request, f'Обновлено позиций меню: {len(changes)}')
+    else:
+        for error in form.errors.get('file', []):
+            messages.error(request, error)
+    return redirect('restaurateur:ProductsView')
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def download_menu_availability(request):
+    response = HttpResponse(
+        dump_availability_csv(),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="menu.csv"'
+    return response
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
@@ -95,11 +254,101 @@ def view_restaurants(request):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = Order.objects.exclude(
-        status=4
-    ).order_by('status').prefetch_related(
-        'items'
-        ).get_order_value().get_closest_restaurants()
+    changes_since = timezone.now()
+    filter_form = get_orders_filter(request.GET)
+    filters = filter_form.cleaned_data
+
+    orders = filter_board_orders(Order.objects.open(), filters)
+    if filters['cursor']:
+        orders = orders.after_board_position(*filters['cursor'])
+
+    page_size = settings.ORDERS_PAGE_SIZE
+    orders = list(orders.ordered_for_board()[:page_size + 1])
+    next_page_url = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        params = request.GET.copy()
+        params['cursor'] = dump_orders_cursor(orders[-1])
+        next_page_url = f'?{params.urlencode()}'
+    find_closest_restaurants(orders)
+    for order in orders:
+        order.board_key = get_board_key(order)
+
+    changes_url = reverse('restaurateur:view_orders_changes')
+    if request.GET:
+        changes_url = f'{changes_url}?{request.GET.urlencode()}'
+
     return render(request, template_name='order_items.html', context={
         "orders": orders,
+        "filter_form": filter_form,
+        "next_page_url": next_page_url,
+        "is_first_page": not filters['cursor'],
+        "board_path": request.get_full_path(),
+        "changes_url": changes_url,
+        "changes_since": changes_since.isoformat(),
+        "changes_poll_interval": settings.ORDERS_POLL_INTERVAL,
     })
+
+
+def get_board_path(params):
+    params = params.copy()
+    params.pop('since', None)
+    board_url = reverse('restaurateur:view_orders')
+    return f'{board_url}?{params.urlencode()}' if params else board_url
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_changes(request):
+    filters = get_orders_filter(request.GET).cleaned_data
+    try:
+        since = datetime.fromisoformat(request.GET['since'])
+    except (KeyError, ValueError):
+        since = timezone.now()
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    # изменения могут закоммититься не в порядке updated_at, поэтому
+    # отдаём небольшое окно до курсора, а повторы отсеивает браузер
+    changed_orders = list(
+        Order.objects.filter(
+            updated_at__gt=since - ORDERS_CHANGES_OVERLAP,
+        ).select_related('preparing_restaurant').order_by('updated_at')
+    )
+    visible_ids = set(
+        filter_board_orders(
+            Order.objects.open().filter(
+                pk__in=[order.id for order in changed_orders],
+            ),
+            filters,
+        ).values_list('pk', flat=True)
+    )
+    prefetch_restaurant_candidates(
+        [order for order in changed_orders if order.id in visible_ids]
+    )
+
+    board_path = get_board_path(request.GET)
+    events = []
+    for order in changed_orders:
+        event = {
+            'id': order.id,
+            'version': order.updated_at.isoformat(),
+            'visible': order.id in visible_ids,
+        }
+        if event['visible']:
+            order.board_key = get_board_key(order)
+            event['board_key'] = order.board_key
+            event['html'] = render_to_string(
+                'order_row.html',
+                context={'order': order, 'board_path': board_path},
+                request=request,
+            )
+        events.append(event)
+    if changed_orders:
+        since = max(since, changed_orders[-1].updated_at)
+
+    response = json_response(
+        request,
+        {'since': since.isoformat(), 'orders': events},
+    )
+    patch_cache_control(response, no_cache=True)
+    return response
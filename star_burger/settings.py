@@ -90,6 +90,12 @@ DATABASES = {
     )
 }
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+CATALOGUE_CACHE_TIMEOUT = env.int('CATALOGUE_CACHE_TIMEOUT', 5 * 60)
+CATALOGUE_CHANGES_TTL = env.timedelta('CATALOGUE_CHANGES_TTL', 7 * 24 * 60 * 60)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -136,6 +142,22 @@ STATICFILES_DIRS = [
 ]
 
 YANDEX_KEY = env('YANDEX_KEY')
+GEOCODER_URL = env('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_CONCURRENCY = env.int('GEOCODER_CONCURRENCY', 8)
+GEOCODER_CACHE_TTL = env.timedelta('GEOCODER_CACHE_TTL', 30 * 24 * 60 * 60)
+GEOCODER_NEGATIVE_CACHE_TTL = env.timedelta(
+    'GEOCODER_NEGATIVE_CACHE_TTL',
+    24 * 60 * 60,
+)
+DISTANCE_ACCURATE = env.bool('DISTANCE_ACCURATE', False)
+DELIVERY_RADIUS = env.float('DELIVERY_RADIUS', 50)
+CLOSEST_RESTAURANTS_COUNT = env.int('CLOSEST_RESTAURANTS_COUNT', 10)
+ORDERS_PAGE_SIZE = env.int('ORDERS_PAGE_SIZE', 50)
+ORDERS_POLL_INTERVAL = env.float('ORDERS_POLL_INTERVAL', 5)
+BULK_ORDERS_MAX_COUNT = env.int('BULK_ORDERS_MAX_COUNT', 1000)
+IDEMPOTENCY_KEY_TTL = env.timedelta('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+ORDERS_ARCHIVE_AFTER_DAYS = env.int('ORDERS_ARCHIVE_AFTER_DAYS', 30)
 
 ROLLBAR = {
     'access_token': env('ROLLBAR_TOKEN'),